@@ -0,0 +1,91 @@
+"""bounded in-memory stores for short-lived bot state"""
+import logging, time
+
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiringStore:
+    """dict-like store where every entry expires after ttl seconds, and the oldest
+    entries are evicted once max_size is exceeded
+    * entries are kept in insertion order, so expiry only ever inspects the head
+    * counters record how many entries were expired or evicted for monitoring
+    """
+
+    def __init__(self, name, ttl=3600, max_size=10000):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self._data = OrderedDict()
+
+        self.expired = 0
+        self.evicted = 0
+
+    def _purge(self, now):
+        if self.ttl:
+            cutoff = now - self.ttl
+            while self._data:
+                key, (timestamp, value) = next(iter(self._data.items()))
+                if timestamp > cutoff:
+                    break
+                del self._data[key]
+                self.expired += 1
+
+        if self.max_size:
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evicted += 1
+
+    def __setitem__(self, key, value):
+        now = time.monotonic()
+        if key in self._data:
+            del self._data[key]
+        self._data[key] = (now, value)
+        self._purge(now)
+
+    def __getitem__(self, key):
+        timestamp, value = self._data[key]
+        if self.ttl and timestamp <= time.monotonic() - self.ttl:
+            del self._data[key]
+            self.expired += 1
+            raise KeyError(key)
+        return value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self._data[key]
+        return value
+
+    def stats(self):
+        self._purge(time.monotonic())
+        return { "name": self.name,
+                 "size": len(self._data),
+                 "expired": self.expired,
+                 "evicted": self.evicted }
@@ -5,6 +5,8 @@ import time
 
 import plugins
 
+from metrics import LatencyRegistry
+
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,14 @@ class CommandDispatcher(object):
 
         self.command_tagsets = {}
 
+        # latency histograms keyed by event.command_path, plus timeout/rejection counters
+        self.stats = LatencyRegistry()
+
+        # in-flight command limiting, see _acquire_slots()
+        self._limiter_global = None
+        self._limiter_global_size = 0
+        self._limiter_users = {}
+
         """
         inbuilt argument preprocessors, recognises:
         * one_chat_id (also resolves #conv)
@@ -430,12 +440,75 @@ class CommandDispatcher(object):
         setattr(event, 'command_module', func.__module__ )
         setattr(event, 'command_path', func.__module__ + '.' + command_name)
 
+        start_time = time.monotonic()
+        timed_out = False
+        rejected = False
         try:
             args = list(args[1:])
             args = self.preprocess_arguments(args, internal_context=event)
-            results = yield from func(bot, event, *args, **kwds)
+
+            # nested dispatch (e.g. echo -> convecho): the calling command already holds the
+            #   slots for this event, acquiring again would deadlock or always reject
+            nested = getattr(event, "command_slots", None) is not None
+            slots = [] if nested else (yield from self._acquire_slots(event))
+            if slots is False:
+                rejected = True
+                self.stats.increment("rejected")
+                logger.warning("RUN: {} rejected, concurrency limit reached".format(event.command_path))
+                if raise_exceptions:
+                    raise RuntimeError("too many commands running, try again later")
+                yield from self.bot.coro_send_message(
+                    event.conv,
+                    _("<em>too many commands running, try again later</em>") )
+                return
+
+            if not nested:
+                event.command_slots = slots
+            try:
+                timeout = self.get_command_timeout(command_name)
+                if timeout:
+                    # a TimeoutError raised inside the command (e.g. by a http request) is
+                    #   not a dispatcher timeout, only flag the expiry of our own wait_for
+                    raised = []
+
+                    @asyncio.coroutine
+                    def _run_command():
+                        try:
+                            return (yield from func(bot, event, *args, **kwds))
+                        except asyncio.TimeoutError:
+                            raised.append(True)
+                            raise
+
+                    try:
+                        results = yield from asyncio.wait_for(_run_command(), timeout)
+                    except asyncio.TimeoutError:
+                        timed_out = not raised
+                        raise
+                else:
+                    results = yield from func(bot, event, *args, **kwds)
+            finally:
+                if not nested:
+                    event.command_slots = None
+                    self._release_slots(slots)
+
             return results
 
+        except asyncio.TimeoutError as e:
+            if raise_exceptions:
+                raise
+
+            if timed_out:
+                self.stats.increment("timeout")
+                logger.warning("RUN: {} timed out after {}s".format(event.command_path, timeout))
+                message = "<b><pre>{0}</pre></b>: <em>timed out after {1}s</em>".format(
+                    func.__name__, timeout)
+            else:
+                logger.exception("RUN: {}".format(func.__name__))
+                message = "<b><pre>{0}</pre></b> <pre>{1}</pre>: <em><pre>{2}</pre></em>".format(
+                    func.__name__, type(e).__name__, str(e))
+
+            yield from self.bot.coro_send_message(event.conv, message)
+
         except Exception as e:
             if raise_exceptions:
                 raise
@@ -446,6 +519,93 @@ class CommandDispatcher(object):
                 "<b><pre>{0}</pre></b> <pre>{1}</pre>: <em><pre>{2}</pre></em>".format(
                     func.__name__, type(e).__name__, str(e)) )
 
+        finally:
+            elapsed = time.monotonic() - start_time
+            if not rejected:
+                self.stats.record(event.command_path, elapsed)
+            if elapsed > (self.bot.get_config_option("metrics.slow_threshold") or 2.0):
+                logger.warning("RUN: {} slow, {:.3f}s on event {}".format(
+                    event.command_path, elapsed, getattr(event, "event_id", None)))
+
+    def get_command_timeout(self, command_name):
+        """config.json: commands.timeout
+        * number of seconds applied to every command, or
+        * dict of { "<command name>": seconds, "*": default seconds }
+        * unset, 0 or null disables the timeout
+        """
+        timeout = self.bot.get_config_option("commands.timeout")
+        if isinstance(timeout, dict):
+            timeout = timeout.get(command_name.lower(), timeout.get("*"))
+        return timeout or None
+
+    @asyncio.coroutine
+    def _acquire_slots(self, event):
+        """limit the number of in-flight commands globally and per-user
+        config.json:
+        * commands.concurrency.global - max commands running at once, 0 = unlimited
+        * commands.concurrency.user - max commands running at once per user, 0 = unlimited
+        * commands.concurrency.policy - "queue" (default) waits for a free slot,
+          "reject" refuses the command immediately
+        returns a list of held semaphores, or False if the command was rejected
+        only the outermost command of an event acquires slots, commands it runs through
+        command.run() share them
+        """
+        limit_global = self.bot.get_config_option("commands.concurrency.global") or 0
+        limit_user = self.bot.get_config_option("commands.concurrency.user") or 0
+        reject = self.bot.get_config_option("commands.concurrency.policy") == "reject"
+
+        limiters = []
+
+        if limit_global:
+            if self._limiter_global is None or self._limiter_global_size != limit_global:
+                # (re)create the limiter when config changes, in-flight holders release the old one
+                self._limiter_global = asyncio.Semaphore(limit_global)
+                self._limiter_global_size = limit_global
+            limiters.append((None, self._limiter_global))
+
+        if limit_user:
+            try:
+                chat_id = event.user_id.chat_id
+            except AttributeError:
+                chat_id = None
+            if chat_id:
+                entry = self._limiter_users.get(chat_id)
+                if entry is None:
+                    entry = self._limiter_users[chat_id] = [ asyncio.Semaphore(limit_user), 0, limit_user ]
+                elif entry[2] != limit_user:
+                    # same as the global limiter, in-flight holders release the old semaphore
+                    entry[0] = asyncio.Semaphore(limit_user)
+                    entry[2] = limit_user
+                entry[1] += 1
+                limiters.append((chat_id, entry[0]))
+
+        if reject and any(semaphore.locked() for _, semaphore in limiters):
+            self._release_slots(limiters, acquired=False)
+            return False
+
+        held = []
+        try:
+            for chat_id, semaphore in limiters:
+                yield from semaphore.acquire()
+                held.append((chat_id, semaphore))
+        except:
+            self._release_slots(held)
+            self._release_slots(limiters[len(held):], acquired=False)
+            raise
+
+        return held
+
+    def _release_slots(self, slots, acquired=True):
+        for chat_id, semaphore in slots:
+            if acquired:
+                semaphore.release()
+            if chat_id is not None:
+                entry = self._limiter_users.get(chat_id)
+                if entry:
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del self._limiter_users[chat_id]
+
     def register(self, *args, admin=False, tags=None, final=False, name=None):
         """Decorator for registering command"""
 
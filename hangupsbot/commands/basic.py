@@ -1,13 +1,18 @@
 import logging
 import importlib
+import os
 import subprocess
 import sys
 import re
+import time
 
 import plugins
 
 from version import __version__
 from commands import command
+from metrics import format_summary_lines
+from parsers import segment_cache
+from profiler import sampler
 
 from utils import event_to_user_bridge
 
@@ -270,7 +275,8 @@ def version(bot, event, *args):
 
 @command.register(admin=True)
 def resourcememory(bot, event, *args):
-    """print basic information about memory usage with resource library"""
+    """print basic information about memory usage with resource library, sizes of the bounded handler
+    stores, the outgoing segment cache and the image upload cache"""
 
     if "resource" not in sys.modules:
         yield from bot.coro_send_message(event.conv,  "<i>resource module not available</i>")
@@ -285,7 +291,148 @@ def resourcememory(bot, event, *args):
 
     message = "memory (resource): {} MB".format(mem)
     logger.info(message)
-    yield from bot.coro_send_message(event.conv,  "<b>" + message + "</b>")
+
+    lines = [ "<b>" + message + "</b>" ]
+    for stats in bot._handlers.store_stats():
+        lines.append("<pre>{name}</pre>: {size} held, {expired} expired, {evicted} evicted".format(**stats))
+    lines.append("<pre>{name}</pre>: {size} cached, {hits} hits, {misses} misses ({hit_rate:.1%}), "
+                 "{evicted} evicted".format(**segment_cache.stats()))
+    if "image_upload_cache" in bot.shared:
+        lines.append("<pre>image uploads</pre>: {urls} urls, {hashes} images, {hits} hits, "
+                     "{misses} misses".format(**bot.shared["image_upload_cache"].summary()))
+
+    yield from bot.coro_send_message(event.conv,  "<br />".join(lines))
+
+
+@command.register(admin=True)
+def commandstats(bot, event, *args):
+    """show per-command latency, timeouts and rejections
+    * /bot commandstats [limit] - slowest commands first, by total time spent
+    * /bot commandstats reset - clear all collected statistics"""
+
+    if args and args[0].lower() == "reset":
+        command.stats.reset()
+        yield from bot.coro_send_message(event.conv, "<i>command statistics cleared</i>")
+        return
+
+    limit = int(args[0]) if args and args[0].isdigit() else 20
+
+    lines = [ "<b>command latency</b>" ]
+    lines.extend(format_summary_lines(command.stats, limit=limit))
+    if len(lines) == 1:
+        lines.append("<i>no commands recorded</i>")
+
+    counters = command.stats.counters
+    lines.append("<b>timeouts:</b> {} <b>rejected:</b> {}".format(
+        counters.get("timeout", 0), counters.get("rejected", 0)))
+
+    yield from bot.coro_send_message(event.conv, "<br />".join(lines))
+
+
+@command.register(admin=True)
+def handlerstats(bot, event, *args):
+    """show per-handler latency by event type and plugin
+    * /bot handlerstats [limit] - most expensive handlers first, by total time spent
+    * /bot handlerstats reset - clear all collected statistics
+    handlers slower than config.json metrics.slow_threshold (default 2s) are also logged"""
+
+    if args and args[0].lower() == "reset":
+        bot._handlers.stats.reset()
+        yield from bot.coro_send_message(event.conv, "<i>handler statistics cleared</i>")
+        return
+
+    limit = int(args[0]) if args and args[0].isdigit() else 20
+
+    lines = [ "<b>handler latency</b>" ]
+    lines.extend(format_summary_lines( bot._handlers.stats,
+                                       limit=limit,
+                                       label=lambda key: "{}: {}.{}".format(*key) ))
+    if len(lines) == 1:
+        lines.append("<i>no handlers recorded</i>")
+
+    yield from bot.coro_send_message(event.conv, "<br />".join(lines))
+
+
+@command.register(admin=True)
+def profile(bot, event, *args):
+    """sample the running bot to find out where time is spent
+    * /bot profile start [interval ms] - begin sampling (default 5ms of cpu time)
+    * /bot profile stop - stop sampling, collected stacks are kept
+    * /bot profile dump [filename] - write collapsed stacks next to config.json for flamegraph.pl
+    * /bot profile reset - discard collected stacks
+    * /bot profile - show status and the busiest plugins"""
+
+    action = args[0].lower() if args else "status"
+
+    try:
+        if action == "start":
+            interval = int(args[1]) / 1000 if len(args) > 1 and args[1].isdigit() else None
+            sampler.start(interval)
+            message = _("<i>profiler started, sampling every {}ms</i>").format(int(sampler.interval * 1000))
+
+        elif action == "stop":
+            sampler.stop()
+            message = _("<i>profiler stopped, {} samples collected</i>").format(sampler.samples)
+
+        elif action == "dump":
+            filename = os.path.basename(args[1]) if len(args) > 1 else "profile-{}.collapsed".format(
+                time.strftime("%Y%m%d-%H%M%S"))
+            path = os.path.join(os.path.dirname(os.path.abspath(bot.config.filename)), filename)
+            lines = sampler.dump(path)
+            message = _("<i>{} stacks written to {}</i>").format(lines, path)
+
+        elif action == "reset":
+            sampler.reset()
+            message = _("<i>profiler samples discarded</i>")
+
+        elif action == "status":
+            lines = [ "<b>profiler:</b> {}, {} samples".format(
+                        "running" if sampler.running else "stopped", sampler.samples) ]
+            for module, count in sampler.top_modules():
+                lines.append("<b><pre>{}</pre></b>: {} ({:.1f}%)".format(
+                    module, count, 100.0 * count / sampler.samples))
+            message = "<br />".join(lines)
+
+        else:
+            message = _("<i>unknown action, use start, stop, dump or reset</i>")
+
+    except (RuntimeError, OSError) as e:
+        message = "<b>profile {}:</b> <pre>{}</pre>".format(action, str(e))
+
+    yield from bot.coro_send_message(event.conv, message)
+
+
+@command.register(admin=True)
+def eventstats(bot, event, *args):
+    """show duplicate event suppression, typing/watermark coalescing, outbound queue and event
+    pipeline queue depth, drops and latency (config.json: workaround.duplicate-events,
+    state_updates.coalesce, outbound.*, http.*, executors.*, event_pipeline.enabled)"""
+
+    lines = [ "<b>duplicate events suppressed:</b> {}".format(bot._duplicate_events_suppressed) ]
+    lines.append( "<b>outbound:</b> {depth} queued in {conversations} conversations, {waiting} waiting "
+                  "<b>sent:</b> {sent} <b>merged:</b> {merged} <b>retried:</b> {retried} "
+                  "<b>failed:</b> {failed}".format(**bot._outbound.summary()) )
+    lines.append( "<b>http:</b> {requests} requests, {errors} errors, max {limit} connections, "
+                  "{limit_per_host} per host".format(**bot.http.summary()) )
+    lines.append( "<b>executor pools</b> (pending/workers): {}".format(
+                    ", ".join( "{pool} {pending}/{size}".format(**pool)
+                               for pool in bot._executors.summary() )) )
+    lines.extend(format_summary_lines( bot._executors.stats,
+                                       label=lambda key: "{} {}".format(*key) ))
+    lines.append( "<b>typing/watermark updates coalesced:</b> {} <b>pending:</b> {}".format(
+                    bot._status_changes_coalesced, len(bot._pending_status_changes)) )
+
+    event_pipeline = bot._event_pipeline
+    if event_pipeline:
+        lines.append( "<b>event pipeline</b>: {workers} workers, {queue_size} per conversation, {overflow}".format(
+                        **vars(event_pipeline)) )
+        lines.append( "<b>queued:</b> {depth} in {conversations} conversations (max {max_depth}) "
+                      "<b>processed:</b> {processed} <b>dropped:</b> {dropped}".format(**event_pipeline.summary()) )
+        lines.extend(format_summary_lines(event_pipeline.stats))
+    else:
+        lines.append("<i>event pipeline is not enabled</i>")
+
+    yield from bot.coro_send_message(event.conv, "<br />".join(lines))
 
 
 @command.register_unknown
@@ -59,7 +59,7 @@ def convecho(bot, event, *args):
             text = ' '.join(posix_args[1:])
             test_segments = simple_parse_to_segments(text)
             if test_segments:
-                if test_segments[0].text.lower().strip().startswith(tuple([cmd.lower() for cmd in bot._handlers.bot_command])):
+                if bot._handlers.starts_with_bot_alias(test_segments[0].text):
                     """detect and reject attempts to exploit botalias"""
                     text = _("<em>command echo blocked</em>")
                     convlist = bot.conversations.get(filter=event.conv_id)
@@ -76,8 +76,7 @@ def convecho(bot, event, *args):
         text = _("<em>no conversations filtered</em>")
         convlist = bot.conversations.get(filter=event.conv_id)
 
-    for convid, convdata in convlist.items():
-        yield from bot.coro_send_message(convid, text)
+    yield from bot.coro_send_many(list(convlist.keys()), text)
 
 
 def convrename(bot, event, *args):
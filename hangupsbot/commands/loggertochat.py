@@ -108,7 +108,7 @@ class ChatMessageLogger(logging.Handler):
     def emit(self, record):
         message = self.format(record)
         convs = self.bot.conversations.get("tag:receive-logs")
-        for conv_id in convs.keys():
+        if convs:
             asyncio.ensure_future(
-                self.bot.coro_send_message(conv_id, message)
+                self.bot.coro_send_many(list(convs.keys()), message)
             ).add_done_callback(lambda future: future.result())
@@ -155,8 +155,16 @@ def pluginreload(bot, event, *args):
         module_path = args[0]
 
         try:
-            yield from plugins.unload(bot, module_path)
-            if plugins.load(bot, module_path):
+            # old handlers keep receiving events until the new ones are registered, load() does
+            #   not yield so the swap happens without events missing both sets
+            stale_handlers = bot._handlers.module_handlers(module_path)
+            yield from plugins.unload(bot, module_path, keep_handlers=True)
+            try:
+                loaded = plugins.load(bot, module_path)
+            finally:
+                bot._handlers.deregister_handlers(stale_handlers, untrack=False)
+
+            if loaded:
                 message = "<b><pre>{}</pre>: reloaded</b>".format(module_path)
             else:
                 message = "<b><pre>{}</pre>: failed reload</b>".format(module_path)
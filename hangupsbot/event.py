@@ -1,4 +1,4 @@
-import logging
+import logging, time
 
 import hangups
 
@@ -6,8 +6,57 @@ import hangups
 logger = logging.getLogger(__name__)
 
 
+class EventLogLimiter:
+    """allow at most rate event log records per second (0 = unlimited), the rest are
+    counted and reported once per second as a single summary record"""
+
+    def __init__(self, rate=20):
+        self.rate = rate
+        self.suppressed = 0
+
+        self._second = 0
+        self._count = 0
+        self._dropped = 0
+
+    def allow(self):
+        if not self.rate:
+            return True
+
+        second = int(time.monotonic())
+        if second != self._second:
+            if self._dropped:
+                logger.info("%s event log records suppressed", self._dropped)
+            self._second = second
+            self._count = 0
+            self._dropped = 0
+
+        self._count += 1
+        if self._count > self.rate:
+            self._dropped += 1
+            self.suppressed += 1
+            return False
+
+        return True
+
+event_log_limiter = EventLogLimiter()
+
+
+class _Lazy:
+    """defer a (possibly expensive) log argument until the record is actually formatted"""
+    __slots__ = ("function",)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __str__(self):
+        return str(self.function())
+
+
 class GenericEvent:
-    bot = None
+    # attributes attached by the handlers and the command dispatcher are slots as well, the
+    #   __dict__ is only allocated once a plugin attaches an attribute of its own
+    __slots__ = ("bot", "passthru", "context", "command_name", "command_module", "command_path",
+                 "command_slots", "acknowledge", "__dict__")
     emit_log = logging.INFO
 
     def __init__(self, bot):
@@ -17,6 +66,9 @@ class GenericEvent:
 class StatusEvent(GenericEvent):
     """base class for all non-ConversationEvent"""
 
+    __slots__ = ("conv_event", "conv_id", "conv", "event_id", "user_id", "user", "timestamp",
+                 "text", "from_bot")
+
     def __init__(self, bot, state_update_event):
         super().__init__(bot)
 
@@ -34,6 +86,8 @@ class StatusEvent(GenericEvent):
 class TypingEvent(StatusEvent):
     """user starts/pauses/stops typing"""
 
+    __slots__ = ()
+
     def __init__(self, bot, state_update_event):
         super().__init__(bot, state_update_event)
 
@@ -50,6 +104,8 @@ class TypingEvent(StatusEvent):
 class WatermarkEvent(StatusEvent):
     """user reads up to a certain point in the conversation"""
 
+    __slots__ = ()
+
     def __init__(self, bot, state_update_event):
         super().__init__(bot, state_update_event)
 
@@ -64,26 +120,68 @@ class WatermarkEvent(StatusEvent):
 
 
 class ConversationEvent(GenericEvent):
-    """user joins, leaves, renames or messages a conversation"""
+    """user joins, leaves, renames or messages a conversation
+    conv, user and text are resolved on first access"""
+
+    __slots__ = ("conv_event", "conv_id", "event_id", "user_id", "timestamp", "from_bot",
+                 "_conv", "_user", "_text")
 
     def __init__(self, bot, conv_event):
         super().__init__(bot)
 
         self.conv_event = conv_event
         self.conv_id = conv_event.conversation_id
-        self.conv = self.bot._conv_list.get(self.conv_id)
         self.event_id = conv_event.id_
         self.user_id = conv_event.user_id
-        self.user = self.conv.get_user(self.user_id)
         self.timestamp = conv_event.timestamp
-        self.text = conv_event.text.strip() if isinstance(conv_event, hangups.ChatMessageEvent) else ''
+
+        self._conv = None
+        self._user = None
+        self._text = None
 
         self.log()
 
+    @property
+    def conv(self):
+        if self._conv is None:
+            self._conv = self.bot._conv_list.get(self.conv_id)
+        return self._conv
+
+    @conv.setter
+    def conv(self, value):
+        self._conv = value
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = self.conv.get_user(self.user_id)
+        return self._user
+
+    @user.setter
+    def user(self, value):
+        self._user = value
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.conv_event.text.strip() if isinstance(self.conv_event, hangups.ChatMessageEvent) else ''
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
 
     def log(self):
-        if logger.isEnabledFor(self.emit_log):
-            logger.log(self.emit_log, 'eid/dt: {}/{}'.format(self.event_id, self.timestamp.astimezone(tz=None).strftime('%Y-%m-%d %H:%M:%S')))
-            logger.log(self.emit_log, 'cid/cn: {}/{}'.format(self.conv_id, self.bot.conversations.get_name(self.conv)))
-            logger.log(self.emit_log, 'c/g/un: {}/{}/{}'.format(self.user_id.chat_id, self.user_id.gaia_id, self.user.full_name))
-            logger.log(self.emit_log, 'len/tx: {}/{}'.format(len(self.text), self.text))
+        """single record, arguments are only formatted if a log handler emits it"""
+        if logger.isEnabledFor(self.emit_log) and event_log_limiter.allow():
+            logger.log(self.emit_log,
+                       'eid/dt: %s/%s cid/cn: %s/%s c/g/un: %s/%s/%s len/tx: %s/%s',
+                       self.event_id,
+                       _Lazy(lambda: self.timestamp.astimezone(tz=None).strftime('%Y-%m-%d %H:%M:%S')),
+                       self.conv_id,
+                       _Lazy(lambda: self.bot.conversations.get_name(self.conv)),
+                       self.user_id.chat_id,
+                       self.user_id.gaia_id,
+                       _Lazy(lambda: self.user.full_name),
+                       _Lazy(lambda: len(self.text)),
+                       _Lazy(lambda: self.text))
@@ -0,0 +1,74 @@
+"""named thread pools for blocking calls, see HangupsBot.run_blocking()
+* a slow api or a long parse only ties up a worker of its own pool, never the event loop
+* pools are sized independently, so one kind of blocking work cannot starve another
+* queue wait (submission until a worker picks the call up) and run time are recorded per pool
+"""
+import asyncio, logging, threading, time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import LatencyRegistry
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_POOLS = { "default": 5, # loop.run_in_executor(None, ...)
+                  "io": 10,     # network and file access from libraries without asyncio support
+                  "cpu": 2 }    # parsing and other pure-python work, bounded by the gil anyway
+
+
+class ExecutorPools:
+    """ThreadPoolExecutor per pool name, created on first use"""
+
+    def __init__(self, sizes=None):
+        self.sizes = dict(DEFAULT_POOLS)
+        if sizes:
+            self.sizes.update(sizes)
+
+        self._executors = {}
+        self._lock = threading.Lock()
+
+        self.stats = LatencyRegistry() # keys: (pool, "wait"|"run")
+        self.pending = {}
+
+    def executor(self, pool="default"):
+        if pool not in self.sizes:
+            raise KeyError("unknown executor pool: {}".format(pool))
+
+        with self._lock:
+            executor = self._executors.get(pool)
+            if executor is None:
+                executor = self._executors[pool] = ThreadPoolExecutor(max_workers=self.sizes[pool])
+        return executor
+
+    @asyncio.coroutine
+    def run(self, pool, function, *args, **kwargs):
+        """run function(*args, **kwargs) in the named pool, returns its result"""
+        executor = self.executor(pool)
+        submitted = time.monotonic()
+        timings = []
+
+        def timed_call():
+            started = time.monotonic()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings.extend((started - submitted, time.monotonic() - started))
+
+        self.pending[pool] = self.pending.get(pool, 0) + 1
+        try:
+            return (yield from asyncio.get_event_loop().run_in_executor(executor, timed_call))
+        finally:
+            self.pending[pool] -= 1
+            if timings:
+                # recorded from the event loop thread, the registry is not thread-safe
+                self.stats.record((pool, "wait"), timings[0])
+                self.stats.record((pool, "run"), timings[1])
+
+    def summary(self):
+        return [ { "pool": pool,
+                   "size": size,
+                   "started": pool in self._executors,
+                   "pending": self.pending.get(pool, 0) }
+                 for pool, size in sorted(self.sizes.items()) ]
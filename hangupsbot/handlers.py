@@ -1,5 +1,7 @@
+import bisect
+import functools
 import logging
-import shlex
+import re
 import asyncio
 import inspect
 import time
@@ -8,12 +10,33 @@ import uuid
 import hangups
 
 import plugins
+from cache import ExpiringStore
+from metrics import LatencyRegistry
 from commands import command
 
 
 logger = logging.getLogger(__name__)
 
 
+# double/single-quoted runs, a stray (unclosed) quote, or a bare word
+_COMMAND_TOKEN = re.compile(r'"[^"]*"|\'[^\']*\'|["\']|[^ \t\r\n"\'][^ \t\r\n]*')
+
+
+@functools.lru_cache(maxsize=256)
+def _tokenize_command(text):
+    """split a command line with the same semantics as shlex.split(text, posix=False)
+    * tokens are separated by spaces, tabs and line breaks
+    * a token starting with a quote runs to the matching quote, quotes are kept
+    * quotes inside a bare word are ordinary characters
+    returns a tuple, raises ValueError on an unclosed quote (as shlex does)
+    """
+    tokens = _COMMAND_TOKEN.findall(text)
+    for token in tokens:
+        if len(token) == 1 and token in "\"'":
+            raise ValueError("No closing quotation")
+    return tuple(tokens)
+
+
 class EventHandler:
     """Handle Hangups conversation events"""
 
@@ -22,12 +45,24 @@ class EventHandler:
         self.bot_command = bot_command
 
         self._prefix_reprocessor = "uuid://"
-        self._reprocessors = {}
 
-        self._passthrus = {}
-        self._contexts = {}
-        self._image_ids = {}
-        self._executables = {}
+        # ids are normally consumed when the bot sees its own message come back, bound them so
+        #   messages that never return (failed sends, bridges, etc) cannot leak memory
+        _store_ttl = bot.get_config_option("handlers.store.ttl") or 3600
+        _store_max_size = bot.get_config_option("handlers.store.max-size") or 10000
+
+        self._reprocessors = ExpiringStore("reprocessors", _store_ttl, _store_max_size)
+        self._passthrus = ExpiringStore("passthrus", _store_ttl, _store_max_size)
+        self._contexts = ExpiringStore("contexts", _store_ttl, _store_max_size)
+        self._image_ids = ExpiringStore("image_ids", _store_ttl, _store_max_size)
+        self._executables = ExpiringStore("executables", _store_ttl, _store_max_size)
+
+        # wall time per (event type, module.path, function), see _run_pluggable()
+        self.stats = LatencyRegistry()
+        self._slow_threshold = bot.get_config_option("metrics.slow_threshold") or 2.0
+
+        # futures waiting for a value to be learned, see register_waiter()
+        self._waiters = {}
 
         self.pluggables = { "allmessages": [],
                             "call": [],
@@ -40,6 +75,17 @@ class EventHandler:
                             "typing": [],
                             "watermark": [] }
 
+        # pluggables[type] is kept sorted by priority: _priorities[type] mirrors it for bisect,
+        #   _handler_index maps handler and original function to [(type, pluggable), ...],
+        #   _module_index maps module.path to [(type, pluggable), ...]
+        self._priorities = { type: [] for type in self.pluggables }
+        self._handler_index = {}
+        self._module_index = {}
+
+        # combined trigger matchers for pre-filtering handlers, rebuilt lazily per event type
+        self._trigger_types = ("allmessages", "message")
+        self._trigger_matchers = {}
+
         bot.register_shared( 'reprocessor.attach_reprocessor',
                              self.attach_reprocessor,
                              forgiving=True )
@@ -48,10 +94,41 @@ class EventHandler:
                              {},
                              forgiving=True )
 
-    def register_handler(self, function, type="message", priority=50, extra_metadata=None):
+    @property
+    def bot_command(self):
+        """list of bot aliases, the first alias is the preferred one"""
+        return self._bot_command
+
+    @bot_command.setter
+    def bot_command(self, aliases):
+        """assigning aliases (e.g. from the botaliases plugin) precomputes the lookup structures"""
+        if not isinstance(aliases, list):
+            aliases = [aliases]
+        self._bot_command = aliases
+        self.bot_command_set = frozenset(alias.lower() for alias in aliases)
+        self.bot_command_prefixes = tuple(sorted(self.bot_command_set, key=len, reverse=True))
+        self._bot_command_maxlen = max([ len(alias) for alias in aliases ] or [0])
+
+    def is_bot_alias(self, word):
+        """O(1) check whether a single word is a bot alias, case-insensitive"""
+        return word.lower() in self.bot_command_set
+
+    def starts_with_bot_alias(self, text):
+        """check whether text (ignoring leading whitespace) starts with any bot alias
+        only the first few characters are lowercased, so this is cheap for long texts"""
+        return text.lstrip()[:self._bot_command_maxlen].lower().startswith(self.bot_command_prefixes)
+
+    def register_handler(self, function, type="message", priority=50, extra_metadata=None, independent=False,
+                         triggers=None):
         """
         register hangouts event handler
         * extra_metadata is function-specific, and will be added along with standard plugin-defined metadata
+        * independent=True marks a handler that does not depend on other handlers of the same
+          priority - consecutive independent handlers sharing a priority are run concurrently
+        * triggers (message/allmessages only) restricts the handler to messages matching at least
+          one cheap predicate, see _compile_triggers() for the supported keys
+          * triggers are checked against event.text as it is when the handler's turn comes, so
+            rewrites by higher-priority handlers are taken into account
         * depending on event type, may perform transparent conversion of function into coroutine for convenience
           * reference to original function is stored as part of handler metadata
         * returns actual handler that will be used
@@ -68,9 +145,16 @@ class EventHandler:
         elif type in ["sending"]:
             if asyncio.iscoroutine(_handler):
                 raise RuntimeError("{} handler cannot be a coroutine".format(type))
+            if independent:
+                raise ValueError("{} handler cannot be independent".format(type))
         else:
             raise ValueError("unknown event type for handler: {}".format(type))
 
+        if triggers:
+            if type not in self._trigger_types:
+                raise ValueError("{} handler cannot have triggers".format(type))
+            extra_metadata["triggers"] = self._compile_triggers(triggers)
+
         current_plugin = plugins.tracking.current()
 
         # build handler-specific metadata
@@ -87,8 +171,12 @@ class EventHandler:
         if not _metadata.get("module.path"):
             raise ValueError("module.path not defined")
 
-        self.pluggables[type].append((_handler, priority, _metadata))
-        self.pluggables[type].sort(key=lambda tup: tup[1])
+        # precompute the call signature once, instead of on every event
+        _arity = len(inspect.signature(_handler).parameters)
+        _is_coroutine = asyncio.iscoroutinefunction(_handler)
+
+        pluggable = (_handler, priority, _metadata, _arity, _is_coroutine, bool(independent))
+        self._insert_pluggable(type, pluggable)
 
         plugins.tracking.register_handler(_handler, type, priority, module_path=_metadata["module.path"])
 
@@ -98,7 +186,7 @@ class EventHandler:
         """
         deregister a handler and stop processing it on events
         * also removes it from plugins.tracking
-        * highly recommended to supply type (e.g. "sending", "message", etc) for optimisation
+        * function can be either the registered handler or the original source function
         """
 
         if type is None:
@@ -110,24 +198,206 @@ class EventHandler:
         else:
             raise TypeError("invalid type {}".format(repr(type)))
 
-        for t in type:
-            if t not in self.pluggables and strict is True:
-                raise ValueError("type {} does not exist".format(t))
-            for h in self.pluggables[t]:
-                # match by either a wrapped coroutine or original source function
-                if h[0] == function or h[2]["function.original"] == function:
-                    # remove from tracking
-                    plugins.tracking.deregister_handler(h[0], module_path=h[2]["module.path"])
-
-                    # remove from being processed
-                    logger.debug("deregister {} handler {}".format(t, h))
-                    self.pluggables[t].remove(h)
+        if strict:
+            for t in type:
+                if t not in self.pluggables:
+                    raise ValueError("type {} does not exist".format(t))
 
-                    return # remove first encountered only
+        for t, pluggable in self._handler_index.get(function, []):
+            if t in type:
+                self._remove_pluggable(t, pluggable)
+                return # remove first encountered only
 
         if strict:
             raise ValueError("{} handler(s) {}".format(type, function))
 
+    def module_handlers(self, module_path):
+        """returns [(type, pluggable), ...] currently registered by a plugin"""
+        return list(self._module_index.get(module_path, []))
+
+    def deregister_handlers(self, handlers, untrack=True):
+        """remove [(type, pluggable), ...] as returned by module_handlers()
+        * untrack=False leaves plugins.tracking alone, e.g. if the plugin was already unloaded"""
+        for type, pluggable in handlers:
+            self._remove_pluggable(type, pluggable, untrack=untrack)
+
+    def _insert_pluggable(self, type, pluggable):
+        """O(log n) search for the insertion point, equal priorities keep registration order"""
+        _handler, priority, _metadata = pluggable[:3]
+
+        index = bisect.bisect_right(self._priorities[type], priority)
+        self._priorities[type].insert(index, priority)
+        self.pluggables[type].insert(index, pluggable)
+
+        entry = (type, pluggable)
+        self._handler_index.setdefault(_handler, []).append(entry)
+        if _metadata["function.original"] is not _handler:
+            self._handler_index.setdefault(_metadata["function.original"], []).append(entry)
+        self._module_index.setdefault(_metadata["module.path"], []).append(entry)
+
+        if "triggers" in _metadata:
+            self._trigger_matchers.pop(type, None)
+
+    def _remove_pluggable(self, type, pluggable, untrack=True):
+        """O(log n) search within the priority band, instead of scanning every handler"""
+        _handler, priority, _metadata = pluggable[:3]
+
+        priorities = self._priorities[type]
+        low = bisect.bisect_left(priorities, priority)
+        high = bisect.bisect_right(priorities, priority)
+        for index in range(low, high):
+            if self.pluggables[type][index] is pluggable:
+                break
+        else:
+            return
+
+        if untrack:
+            plugins.tracking.deregister_handler(_handler, module_path=_metadata["module.path"])
+
+        logger.debug("deregister {} handler {}".format(type, pluggable))
+        del priorities[index]
+        del self.pluggables[type][index]
+
+        for key, lookup in ( (_handler, self._handler_index),
+                             (_metadata["function.original"], self._handler_index),
+                             (_metadata["module.path"], self._module_index) ):
+            entries = lookup.get(key)
+            if entries:
+                entries[:] = [ entry for entry in entries if entry[1] is not pluggable ]
+                if not entries:
+                    del lookup[key]
+
+        self._trigger_matchers.pop(type, None)
+
+    def _compile_triggers(self, triggers):
+        """convert a declarative trigger definition into expressions, supports:
+        * "prefix": string or list of strings that the message must start with
+        * "contains": string or list of substrings that must appear anywhere in the message
+        * "regex": regular expression (string, compiled pattern or list) searched anywhere in
+          the message, the i/m/s/x flags of compiled patterns are kept
+        all matching is case-insensitive, a handler fires if any single trigger matches
+        regular expressions must not rely on named groups or numbered backreferences
+        """
+        if not isinstance(triggers, dict):
+            raise TypeError("triggers must be a dict, got {}".format(repr(triggers)))
+
+        expressions = []
+        for kind, values in triggers.items():
+            if isinstance(values, (str, re.Pattern)):
+                values = [ values ]
+            if not values:
+                continue
+
+            if kind == "prefix":
+                expression = r"\A(?i:{})".format("|".join(re.escape(value) for value in values))
+            elif kind == "contains":
+                expression = "(?i:{})".format("|".join(re.escape(value) for value in values))
+            elif kind == "regex":
+                expression = "(?i:{})".format("|".join(self._inline_regex(value) for value in values))
+            else:
+                raise ValueError("unknown trigger type: {}".format(kind))
+
+            re.compile(expression) # fail early on invalid expressions
+            expressions.append(expression)
+
+        return expressions
+
+    @staticmethod
+    def _inline_regex(value):
+        """wrap a regex trigger in a group, compiled patterns keep their flags as inline flags"""
+        if not isinstance(value, re.Pattern):
+            return "(?:{})".format(value)
+
+        flags = "".join( letter for flag, letter in ( (re.IGNORECASE, "i"), (re.MULTILINE, "m"),
+                                                      (re.DOTALL, "s"), (re.VERBOSE, "x") )
+                         if value.flags & flag )
+        return "(?{}:{})".format(flags, value.pattern) if flags else "(?:{})".format(value.pattern)
+
+    def _build_trigger_matcher(self, type):
+        """combine every trigger of an event type into one alternation that finds the positions
+        where any trigger starts, plus each trigger compiled on its own to tell which of them
+        match at such a position"""
+        expressions = []
+        for pluggable in self.pluggables[type]:
+            for expression in pluggable[2].get("triggers") or []:
+                expressions.append((expression, pluggable[0]))
+
+        try:
+            if expressions:
+                scanner = re.compile("|".join("(?:{})".format(expression) for expression, _ in expressions))
+                matcher = (scanner, [ (re.compile(expression), handler) for expression, handler in expressions ])
+            else:
+                matcher = None
+        except re.error as e:
+            # should not happen as expressions are validated, but never lose events over it
+            logger.error("{} triggers could not be combined, filtering disabled: {}".format(type, e))
+            matcher = False
+
+        self._trigger_matchers[type] = matcher
+        return matcher
+
+    def _triggered_handlers(self, type, text):
+        """returns the set of handlers triggered by text, or None if filtering does not apply
+        the text is scanned once, left to right: at every position where the alternation finds
+        a trigger, the triggers that have not fired yet are tried anchored at that position, so
+        overlapping triggers and triggers starting at the same position are all reported"""
+        try:
+            matcher = self._trigger_matchers[type]
+        except KeyError:
+            matcher = self._build_trigger_matcher(type)
+
+        if not matcher:
+            return None
+
+        scanner, pending = matcher
+        triggered = set()
+        match = scanner.search(text)
+        while match is not None and pending:
+            position = match.start()
+            remaining = []
+            for regex, handler in pending:
+                if handler in triggered:
+                    continue
+                if regex.match(text, position):
+                    triggered.add(handler)
+                else:
+                    remaining.append((regex, handler))
+            pending = remaining
+            match = scanner.search(text, position + 1)
+
+        return triggered
+
+    def store_stats(self):
+        """sizes and eviction counters of the bounded id stores"""
+        return [ store.stats() for store in ( self._reprocessors,
+                                              self._passthrus,
+                                              self._contexts,
+                                              self._image_ids,
+                                              self._executables ) ]
+
+    def register_waiter(self, key):
+        """register interest in a value that will be learned later (e.g. from an incoming event)
+        returns an asyncio.Future resolved by resolve_waiters() with the same key
+        callers should always discard_waiter() when done, e.g. after a timeout"""
+        future = asyncio.Future()
+        self._waiters.setdefault(key, []).append(future)
+        return future
+
+    def discard_waiter(self, key, future):
+        futures = self._waiters.get(key)
+        if futures and future in futures:
+            futures.remove(future)
+            if not futures:
+                del self._waiters[key]
+
+    def resolve_waiters(self, key, value):
+        """wake every future waiting on key, returns the number of waiters resolved"""
+        futures = self._waiters.pop(key, [])
+        for future in futures:
+            if not future.done():
+                future.set_result(value)
+        return len(futures)
+
     def register_passthru(self, variable):
         _id = str(uuid.uuid4())
         self._passthrus[_id] = variable
@@ -194,16 +464,19 @@ class EventHandler:
         posting it first via the api. other plugins and functions can establish a short-lived
         task to wait for the image id to be posted, and retrieve the url in an asyncronous way"""
 
-        ticks = 0
-        while True:
-            if image_id not in self._image_ids:
-                yield from asyncio.sleep(1)
-                ticks = ticks + 1
-                if ticks > 60:
-                    return False
-            else:
-                yield from callback(self._image_ids[image_id], *args, **kwargs)
-                return True
+        image_uri = self._image_ids.get(image_id)
+        if image_uri is None:
+            key = ("image_id", image_id)
+            future = self.register_waiter(key)
+            try:
+                image_uri = yield from asyncio.wait_for(future, 60)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.discard_waiter(key, future)
+
+        yield from callback(image_uri, *args, **kwargs)
+        return True
 
     @asyncio.coroutine
     def run_reprocessor(self, id, event, *args, **kwargs):
@@ -259,7 +532,7 @@ class EventHandler:
                         return
 
             """map image ids to their public uris in absence of any fixed server api
-               XXX: small memory leak over time as each id gets cached indefinitely"""
+               mappings expire according to config.json handlers.store.ttl"""
 
             if( event.passthru
                     and "original_request" in event.passthru
@@ -273,9 +546,10 @@ class EventHandler:
                 if _image_id not in self._image_ids:
                     self._image_ids[_image_id] = _image_uri
                     logger.info("associating image_id={} with {}".format(_image_id, _image_uri))
+                    self.resolve_waiters(("image_id", _image_id), _image_uri)
 
             """first occurence of an actual executable id needs to be handled as an event
-               XXX: small memory leak over time as each id gets cached indefinitely"""
+               ids are remembered according to config.json handlers.store.ttl"""
 
             if( event.passthru and "executable" in event.passthru and event.passthru["executable"] ):
                 if event.passthru["executable"] not in self._executables:
@@ -296,6 +570,15 @@ class EventHandler:
     def handle_command(self, event):
         """Handle command messages"""
 
+        # fast pre-check: is a bot alias used e.g. /bot - only looks at the first word
+        first_word = event.text.split(None, 1)[0] if event.text else ""
+        aliased = self.is_bot_alias(first_word)
+
+        if not aliased:
+            if not( self.bot.conversations.catalog[event.conv_id]["type"] == "ONE_TO_ONE"
+                    and self.bot.get_config_option('auto_alias_one_to_one') ):
+                return
+
         # is commands_enabled?
 
         config_commands_enabled = self.bot.get_config_suboption(event.conv_id, 'commands_enabled')
@@ -307,21 +590,22 @@ class EventHandler:
             if event.user_id.chat_id not in admins_list:
                 return
 
-        # ensure bot alias is always a list
-        if not isinstance(self.bot_command, list):
-            self.bot_command = [self.bot_command]
+        if not aliased:
+            event.text = u" ".join((self.bot_command[0], event.text)) # Insert default alias if not already present
 
-        # check that a bot alias is used e.g. /bot
-        if not event.text.split()[0].lower() in self.bot_command:
-            if self.bot.conversations.catalog[event.conv_id]["type"] == "ONE_TO_ONE" and self.bot.get_config_option('auto_alias_one_to_one'):
-                event.text = u" ".join((self.bot_command[0], event.text)) # Insert default alias if not already present
-            else:
-                return
+        # refuse to tokenise huge pastes
+        max_length = self.bot.get_config_option('commands.max_length') or 4096
+        if len(event.text) > max_length:
+            logger.warning("command from {} ignored, {} characters exceeds {}".format(
+                event.user_id.chat_id, len(event.text), max_length))
+            yield from self.bot.coro_send_message(event.conv, _("{}: command too long ({} characters, limit is {})").format(
+                event.user.full_name, len(event.text), max_length))
+            return
 
         # Parse message
         event.text = event.text.replace(u'\xa0', u' ') # convert non-breaking space in Latin1 (ISO 8859-1)
         try:
-            line_args = shlex.split(event.text, posix=False)
+            line_args = list(_tokenize_command(event.text))
         except Exception as e:
             logger.exception(e)
             yield from self.bot.coro_send_message(event.conv, _("{}: {}").format(
@@ -396,51 +680,122 @@ class EventHandler:
     @asyncio.coroutine
     def run_pluggable_omnibus(self, name, *args, **kwargs):
         if name in self.pluggables:
+            debug = logger.isEnabledFor(logging.DEBUG)
+
+            event = args[1] if name in self._trigger_types else None
+            scanned = None # (text, triggered handlers) of the last trigger check
+
+            def is_triggered(pluggable):
+                nonlocal scanned
+                if event is None or "triggers" not in pluggable[2]:
+                    return True
+                # handlers may rewrite event.text, check against the current text
+                text = getattr(event, "text", None) or ""
+                if scanned is None or scanned[0] != text:
+                    scanned = (text, self._triggered_handlers(name, text))
+                return scanned[1] is None or pluggable[0] in scanned[1]
+
+            # handlers may (de)register while we await, iterate over a copy
+            pluggables = list(self.pluggables[name])
+            total = len(pluggables)
+            index = 0
             try:
-                for function, priority, plugin_metadata in self.pluggables[name]:
-                    message = ["{}: {}.{}".format(
-                                name,
-                                plugin_metadata["module.path"],
-                                function.__name__)]
-
-                    try:
-                        """accepted handler signatures:
-                        coroutine(bot, event, command)
-                        coroutine(bot, event)
-                        function(bot, event, context)
-                        function(bot, event)
-                        """
-                        _expected = list(inspect.signature(function).parameters)
-                        _passed = args[0:len(_expected)]
-                        if asyncio.iscoroutinefunction(function):
-                            message.append("coroutine")
-                            logger.debug(" : ".join(message))
-                            yield from function(*_passed)
-                        else:
-                            message.append("function")
-                            logger.debug(" : ".join(message))
-                            function(*_passed)
-                    except self.bot.Exceptions.SuppressHandler:
-                        # skip this pluggable, continue with next
-                        message.append("SuppressHandler")
-                        logger.debug(" : ".join(message))
-                        pass
-                    except (self.bot.Exceptions.SuppressEventHandling,
-                            self.bot.Exceptions.SuppressAllHandlers):
-                        # skip all pluggables, decide whether to handle event at next level
-                        raise
-                    except:
-                        message = " : ".join(message)
-                        logger.exception(message)
+                while index < total:
+                    pluggable = pluggables[index]
+                    index += 1
+
+                    if not is_triggered(pluggable):
+                        continue
+
+                    if not pluggable[5]:
+                        yield from self._run_pluggable(name, pluggable, args, debug)
+                        continue
+
+                    # gather consecutive independent handlers in the same priority band
+                    batch = [ pluggable ]
+                    while( index < total
+                            and pluggables[index][5]
+                            and pluggables[index][1] == pluggable[1] ):
+                        if is_triggered(pluggables[index]):
+                            batch.append(pluggables[index])
+                        index += 1
+
+                    if len(batch) == 1:
+                        yield from self._run_pluggable(name, pluggable, args, debug)
+                        continue
+
+                    results = yield from asyncio.gather(
+                        *[ self._run_pluggable(name, _pluggable, args, debug) for _pluggable in batch ],
+                        return_exceptions=True )
+
+                    # propagate suppression after the whole batch has finished
+                    for _suppress in ( self.bot.Exceptions.SuppressEventHandling,
+                                       self.bot.Exceptions.SuppressAllHandlers ):
+                        for result in results:
+                            if isinstance(result, _suppress):
+                                raise result
+                    for result in results:
+                        if isinstance(result, BaseException):
+                            raise result
 
             except self.bot.Exceptions.SuppressAllHandlers:
                 # skip all other pluggables, but let the event continue
-                message.append("SuppressAllHandlers")
-                logger.debug(" : ".join(message))
+                if debug:
+                    logger.debug("{} : SuppressAllHandlers".format(name))
 
             except:
                 raise
 
+    @asyncio.coroutine
+    def _run_pluggable(self, name, pluggable, args, debug):
+        function, priority, plugin_metadata, arity, is_coroutine = pluggable[:5]
+        start_time = time.monotonic()
+        try:
+            """accepted handler signatures:
+            coroutine(bot, event, command)
+            coroutine(bot, event)
+            function(bot, event, context)
+            function(bot, event)
+            """
+            _passed = args[0:arity]
+            if is_coroutine:
+                if debug:
+                    logger.debug(self._pluggable_label(name, function, plugin_metadata, "coroutine"))
+                yield from function(*_passed)
+            else:
+                if debug:
+                    logger.debug(self._pluggable_label(name, function, plugin_metadata, "function"))
+                function(*_passed)
+        except self.bot.Exceptions.SuppressHandler:
+            # skip this pluggable, continue with next
+            if debug:
+                logger.debug(self._pluggable_label(name, function, plugin_metadata, "SuppressHandler"))
+        except (self.bot.Exceptions.SuppressEventHandling,
+                self.bot.Exceptions.SuppressAllHandlers):
+            # skip all pluggables, decide whether to handle event at next level
+            if debug:
+                logger.debug(self._pluggable_label(name, function, plugin_metadata, "Suppress*"))
+            raise
+        except asyncio.CancelledError:
+            raise
+        except:
+            logger.exception(self._pluggable_label(name, function, plugin_metadata))
+        finally:
+            elapsed = time.monotonic() - start_time
+            self.stats.record((name, plugin_metadata["module.path"], function.__name__), elapsed)
+            if elapsed > self._slow_threshold:
+                logger.warning("{} : slow, {:.3f}s on event {}".format(
+                    self._pluggable_label(name, function, plugin_metadata),
+                    elapsed,
+                    getattr(args[1], "event_id", None) if len(args) > 1 else None ))
+
+    def _pluggable_label(self, name, function, plugin_metadata, *extra):
+        message = [ "{}: {}.{}".format( name,
+                                        plugin_metadata["module.path"],
+                                        function.__name__ ) ]
+        message.extend(extra)
+        return " : ".join(message)
+
 class HandlerBridge:
     """shim for xmikosbot handler decorator"""
 
@@ -1,4 +1,4 @@
-import asyncio, logging, time
+import asyncio, logging, time, weakref
 
 from collections import namedtuple
 
@@ -6,7 +6,7 @@ import hangups
 
 import hangups_shim
 
-from utils import ( simple_parse_to_segments,
+from utils import ( parse_to_serialised_segments,
                     segment_to_html )
 
 
@@ -48,6 +48,18 @@ SelfConversationState = namedtuple( 'self_conversation_state',
                                       'view' ])
 
 
+# one send lock per conversation id, shared by every HangupsConversation/FakeConversation
+#   instance so concurrent sends to a chat keep their order without blocking other chats
+#   entries disappear once no coroutine holds or waits for the lock
+_send_locks = weakref.WeakValueDictionary()
+
+def get_send_lock(conv_id):
+    lock = _send_locks.get(conv_id)
+    if lock is None:
+        lock = _send_locks[conv_id] = asyncio.Lock()
+    return lock
+
+
 class HangupsConversation(hangups.conversation.Conversation):
     bot = None
 
@@ -143,7 +155,7 @@ class HangupsConversation(hangups.conversation.Conversation):
         self._user_list = []
         self._events = []
         self._events_dict = {}
-        self._send_message_lock = asyncio.Lock()
+        self._send_message_lock = get_send_lock(conv_id)
 
     @property
     def users(self):
@@ -161,6 +173,8 @@ class FakeConversation(object):
 
         """ChatMessageSegment: parse message"""
 
+        serialised_segments = None
+
         if message is None:
             # nothing to do if the message is blank
             segments = []
@@ -171,7 +185,7 @@ class FakeConversation(object):
             raw_message = message.replace("*", "\\*").replace("_", "\\_").replace("`", "\\`")
         elif isinstance(message, str):
             # preferred method: markdown-formatted message (or less preferable but OK: html)
-            segments = simple_parse_to_segments(message)
+            segments, serialised_segments = parse_to_serialised_segments(message)
             raw_message = message
         elif isinstance(message, list):
             # who does this anymore?
@@ -183,10 +197,10 @@ class FakeConversation(object):
         else:
             raise TypeError("unknown message type supplied")
 
-        if segments:
-            serialised_segments = [seg.serialize() for seg in segments]
-        else:
+        if not segments:
             serialised_segments = None
+        elif serialised_segments is None:
+            serialised_segments = [seg.serialize() for seg in segments]
 
         if "original_request" not in context["passthru"]:
             context["passthru"]["original_request"] = { "message": raw_message,
@@ -239,7 +253,7 @@ class FakeConversation(object):
 
         """send the message"""
 
-        with (yield from asyncio.Lock()):
+        with (yield from get_send_lock(self.id_)):
             yield from self._client.send_chat_message(
                 hangups.hangouts_pb2.SendChatMessageRequest(
                     request_header = self._client.get_request_header(),
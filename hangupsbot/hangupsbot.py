@@ -1,28 +1,33 @@
 #!/usr/bin/env python3
 import appdirs, argparse, asyncio, gettext, logging, logging.config, os, shutil, signal, sys, time
-from concurrent.futures import ThreadPoolExecutor
 
 import hangups
 
 import hangups_shim
 
 import config
+import executors
 import handlers
 import version
 
 import permamem
+import outbound
+import pipeline
 import tagging
 
 import hooks
+import httpclient
 import sinks
 import plugins
 
 from exceptions import HangupsBotExceptions
-from event import (TypingEvent, WatermarkEvent, ConversationEvent)
+from event import (TypingEvent, WatermarkEvent, ConversationEvent, event_log_limiter)
 from hangups_conversation import (HangupsConversation, FakeConversation)
 
+from cache import ExpiringStore
 from commands import command
 from permamem import conversation_memory
+from parsers import segment_cache
 from utils import simple_parse_to_segments, class_from_name
 
 
@@ -50,7 +55,18 @@ class HangupsBot(object):
         self._user_list = None # hangups.UserList
         self._handlers = None # handlers.py::EventHandler
 
-        self._cache_event_id = {} # workaround for duplicate events
+        self._cache_event_id = None # workaround for duplicate events, see _is_duplicate_event()
+        self._duplicate_events_suppressed = 0
+
+        self._pending_status_changes = {} # latest typing/watermark update per (type, conv_id, chat_id)
+        self._status_changes_coalesced = 0
+
+        self._event_pipeline = None # pipeline.py::EventPipeline, if enabled
+        self._outbound = None # outbound.py::OutboundScheduler
+
+        self.http = None # httpclient.py::HttpClient, shared by all plugins
+
+        self._executors = None # executors.py::ExecutorPools, see run_blocking()
 
         self._locales = {}
 
@@ -61,6 +77,51 @@ class HangupsBot(object):
             logging.exception("failed to load config, malformed json")
             sys.exit()
 
+        # remember recently seen event ids for config.workaround.duplicate-events
+        self._cache_event_id = ExpiringStore(
+            "duplicate-events",
+            ttl = self.get_config_option('workaround.duplicate-events.window') or 3,
+            max_size = None )
+
+        # config.json outbound.*: rate limits (messages per second, 0 = unlimited) and batching
+        self._outbound = outbound.OutboundScheduler(
+            self._send_outbound,
+            global_rate = self._outbound_option("global.rate", 10),
+            global_burst = self._outbound_option("global.burst", 20),
+            conversation_rate = self._outbound_option("conversation.rate", 2),
+            conversation_burst = self._outbound_option("conversation.burst", 5),
+            merge = self._outbound_option("merge", False),
+            merge_window = self._outbound_option("merge.window", 0),
+            merge_max_length = self._outbound_option("merge.max_length", 200),
+            retries = self._outbound_option("retries", 3) )
+
+        # config.json http.*: shared http client connection pool and default timeout (seconds)
+        self.http = httpclient.HttpClient(
+            limit = self._http_option("limit", 100),
+            limit_per_host = self._http_option("limit_per_host", 8),
+            dns_cache_ttl = self._http_option("dns_cache_ttl", 300),
+            keepalive_timeout = self._http_option("keepalive_timeout", 30),
+            timeout = self._http_option("timeout", 30),
+            user_agent = self._http_option("user_agent", None) )
+
+        # config.json executors.<pool>: worker threads per pool, max_threads sizes the default pool
+        _pool_sizes = {}
+        for _pool in executors.DEFAULT_POOLS:
+            _size = self.get_config_option("max_threads" if _pool == "default" else "executors." + _pool)
+            if _size:
+                _pool_sizes[_pool] = _size
+        self._executors = executors.ExecutorPools(_pool_sizes)
+
+        # config.json parsers.segment_cache.size: outgoing texts kept parsed, 0 disables
+        _segment_cache_size = self.get_config_option('parsers.segment_cache.size')
+        if _segment_cache_size is not None:
+            segment_cache.max_size = _segment_cache_size
+
+        # config.json logging.events.rate: max conversation event log records per second, 0 = unlimited
+        _event_log_rate = self.get_config_option('logging.events.rate')
+        if _event_log_rate is not None:
+            event_log_limiter.rate = _event_log_rate
+
         # set localisation if anything defined in config.language or ENV[HANGOUTSBOT_LOCALE]
         _language = self.get_config_option('language') or os.environ.get("HANGOUTSBOT_LOCALE")
         if _language:
@@ -132,6 +193,12 @@ class HangupsBot(object):
         else:
             return object
 
+    @asyncio.coroutine
+    def run_blocking(self, function, *args, pool="io", **kwargs):
+        """run a blocking call in a worker thread of the named pool, without stalling the event loop
+        pools: "io" (network/file access), "cpu" (parsing), "default" - see config.json executors.*"""
+        return (yield from self._executors.run(pool, function, *args, **kwargs))
+
     def login(self, cookies_path):
         """Login to Google account"""
         # Authenticate Google user and save auth cookies
@@ -150,8 +217,7 @@ class HangupsBot(object):
         if cookies:
             # Start asyncio event loop
             loop = asyncio.get_event_loop()
-            threads = self.get_config_option("max_threads") or 5
-            loop.set_default_executor(ThreadPoolExecutor(max_workers=threads))
+            loop.set_default_executor(self._executors.executor("default"))
 
             # initialise pluggable framework
             hooks.load(self)
@@ -176,6 +242,7 @@ class HangupsBot(object):
                     logger.exception("CLIENT: unrecoverable low-level error")
                 finally:
                     loop.run_until_complete(plugins.unload_all(self))
+                    loop.run_until_complete(self.http.close())
 
                     self.memory.flush()
                     self.config.flush()
@@ -579,32 +646,95 @@ class HangupsBot(object):
         plugins.load(self, "commands.loggertochat")
         plugins.load_user_plugins(self)
 
+        if self.get_config_option("event_pipeline.enabled"):
+            """
+            config.json:
+            * event_pipeline.enabled - process each conversation's events in order
+            * event_pipeline.workers - conversations processed concurrently (default 16)
+            * event_pipeline.queue_size - queued events per conversation (default 100)
+            * event_pipeline.overflow - "drop_oldest" (default), "drop_newest" or "block"
+            """
+            self._event_pipeline = pipeline.EventPipeline(
+                workers = self.get_config_option("event_pipeline.workers") or 16,
+                queue_size = self.get_config_option("event_pipeline.queue_size") or 100,
+                overflow = self.get_config_option("event_pipeline.overflow") or "drop_oldest" )
+
         self._conv_list.on_event.add_observer(self._on_event)
         self._client.on_state_update.add_observer(self._on_status_changes)
 
         logger.info("bot initialised")
 
 
+    def _is_duplicate_event(self, event_id):
+        """config.json workaround.duplicate-events: detect events seen within the last
+        workaround.duplicate-events.window seconds (default 3), O(1) check and insert"""
+        if not self.get_config_option('workaround.duplicate-events'):
+            return False
+
+        if event_id in self._cache_event_id:
+            self._duplicate_events_suppressed += 1
+            logger.warning("duplicate event {} ignored".format(event_id))
+            return True
+
+        self._cache_event_id[event_id] = True
+        return False
+
     def _on_status_changes(self, state_update):
         notification_type = state_update.WhichOneof('state_update')
         if notification_type == 'typing_notification':
-            asyncio.ensure_future(
-                self._handlers.handle_typing_notification(
-                    TypingEvent(self, state_update.typing_notification)
-                )
-            ).add_done_callback(lambda future: future.result())
+            notification = state_update.typing_notification
+            handler_type = "typing"
+            event_key = ( notification.timestamp,
+                          notification.type )
         elif notification_type == 'watermark_notification':
-            asyncio.ensure_future(
-                self._handlers.handle_watermark_notification(
-                    WatermarkEvent(self, state_update.watermark_notification)
-                )
-            ).add_done_callback(lambda future: future.result())
-        elif notification_type == 'event_notification':
+            notification = state_update.watermark_notification
+            handler_type = "watermark"
+            event_key = ( notification.latest_read_timestamp, )
+        else:
             """
             XXX: Unsupported State Updates (state_update):
             re: https://github.com/tdryer/hangups/blob/9a27ecd0cbfd94acf8959e89c52ac3250c920a1f/hangups/hangouts.proto#L1034
             """
-            pass
+            return
+
+        # nothing listens: skip building the event (user lookup, hangups parser) entirely
+        if not self._handlers.pluggables[handler_type]:
+            return
+
+        key = ( handler_type,
+                notification.conversation_id.id,
+                notification.sender_id.chat_id )
+
+        if self._is_duplicate_event(key + event_key):
+            return
+
+        # config.json state_updates.coalesce: seconds to collect rapid typing/watermark updates
+        #   from the same user in a conversation, only the latest is dispatched. 0 disables
+        window = self.get_config_option('state_updates.coalesce')
+        if window is None:
+            window = 0.5
+
+        if not window:
+            self._dispatch_status_change(handler_type, notification)
+            return
+
+        if key in self._pending_status_changes:
+            self._status_changes_coalesced += 1
+        else:
+            asyncio.get_event_loop().call_later(window, self._flush_status_change, key)
+        self._pending_status_changes[key] = notification
+
+    def _flush_status_change(self, key):
+        notification = self._pending_status_changes.pop(key, None)
+        if notification is not None:
+            self._dispatch_status_change(key[0], notification)
+
+    def _dispatch_status_change(self, handler_type, notification):
+        if handler_type == "typing":
+            coro = self._handlers.handle_typing_notification(TypingEvent(self, notification))
+        else:
+            coro = self._handlers.handle_watermark_notification(WatermarkEvent(self, notification))
+        asyncio.ensure_future(coro).add_done_callback(lambda future: future.result())
 
 
     @asyncio.coroutine
@@ -613,16 +743,8 @@ class HangupsBot(object):
 
         self._execute_hook("on_event", conv_event)
 
-        if self.get_config_option('workaround.duplicate-events'):
-            if conv_event.id_ in self._cache_event_id:
-                logger.warning("duplicate event {} ignored".format(conv_event.id_))
-                return
-
-            self._cache_event_id = {k: v for k, v in self._cache_event_id.items() if v > time.time()-3}
-            self._cache_event_id[conv_event.id_] = time.time()
-
-            logger.info("duplicate events workaround: event id = {} timestamp = {}".format(
-                conv_event.id_, conv_event.timestamp))
+        if self._is_duplicate_event(conv_event.id_):
+            return
 
         event = ConversationEvent(self, conv_event)
 
@@ -631,36 +753,24 @@ class HangupsBot(object):
 
         if isinstance(conv_event, hangups.ChatMessageEvent):
             self._execute_hook("on_chat_message", event)
-            asyncio.ensure_future(
-                self._handlers.handle_chat_message(event)
-            ).add_done_callback(lambda future: future.result())
+            handler = self._handlers.handle_chat_message
 
         elif isinstance(conv_event, hangups.MembershipChangeEvent):
             self._execute_hook("on_membership_change", event)
-            asyncio.ensure_future(
-                self._handlers.handle_chat_membership(event)
-            ).add_done_callback(lambda future: future.result())
+            handler = self._handlers.handle_chat_membership
 
         elif isinstance(conv_event, hangups.RenameEvent):
             self._execute_hook("on_rename", event)
-            asyncio.ensure_future(
-                self._handlers.handle_chat_rename(event)
-            ).add_done_callback(lambda future: future.result())
+            handler = self._handlers.handle_chat_rename
 
         elif isinstance(conv_event, hangups.GroupLinkSharingModificationEvent):
-            asyncio.ensure_future(
-                self._handlers.handle_chat_link_share(event)
-            ).add_done_callback(lambda future: future.result())
+            handler = self._handlers.handle_chat_link_share
 
         elif isinstance(conv_event, hangups.OTREvent):
-            asyncio.ensure_future(
-                self._handlers.handle_chat_history(event)
-            ).add_done_callback(lambda future: future.result())
+            handler = self._handlers.handle_chat_history
 
         elif type(conv_event) is hangups.conversation_event.HangoutEvent:
-            asyncio.ensure_future(
-                self._handlers.handle_call(event)
-            ).add_done_callback(lambda future: future.result())
+            handler = self._handlers.handle_call
 
         else:
             """
@@ -670,6 +780,15 @@ class HangupsBot(object):
             """
 
             logger.warning("_on_event(): unrecognised event type: {}".format(type(conv_event)))
+            return
+
+        if self._event_pipeline:
+            # ordered per conversation, bounded and concurrency-limited
+            yield from self._event_pipeline.submit(event.conv_id, handler, event)
+        else:
+            asyncio.ensure_future(
+                handler(event)
+            ).add_done_callback(lambda future: future.result())
 
 
     def _execute_hook(self, funcname, parameters=None):
@@ -729,16 +848,37 @@ class HangupsBot(object):
             self.send_html_to_conversation(user_id_or_conversation_id, html, context)
 
 
+    def _outbound_option(self, option, default):
+        value = self.get_config_option("outbound." + option)
+        return default if value is None else value
+
+    def _http_option(self, option, default):
+        value = self.get_config_option("http." + option)
+        return default if value is None else value
+
     @asyncio.coroutine
-    def coro_send_message(self, conversation, message, context=None, image_id=None):
-        if not message and not image_id:
-            # at least a message OR an image_id must be supplied
-            return
+    def _send_outbound(self, conversation_id, message, image_id, context):
+        # send messages using FakeConversation as a workaround
+        _fc = FakeConversation(self, conversation_id)
+        yield from _fc.send_message( message,
+                                     image_id = image_id,
+                                     context = context )
+
+    def _conversation_id(self, conversation):
+        if isinstance(conversation, (FakeConversation, hangups.conversation.Conversation)):
+            return conversation.id_
+        elif isinstance(conversation, str):
+            return conversation
+        else:
+            raise ValueError('could not identify conversation id')
 
-        # get the context
+    @asyncio.coroutine
+    def _send_broadcast_list(self, broadcast_list, context, bulk):
+        """run sending handlers over broadcast_list and queue every entry for sending
+        returns (conversation id, future resolving True if sent) per queued entry, or None if
+        sending was suppressed"""
 
-        if not context:
-            context = {}
+        # get the context
 
         if "passthru" not in context:
             context['passthru'] = {}
@@ -747,24 +887,13 @@ class HangupsBot(object):
             # default legacy context
             context["base"] = self._messagecontext_legacy()
 
-        # get the conversation id
-
-        if isinstance(conversation, (FakeConversation, hangups.conversation.Conversation)):
-            conversation_id = conversation.id_
-        elif isinstance(conversation, str):
-            conversation_id = conversation
-        else:
-            raise ValueError('could not identify conversation id')
-
-        broadcast_list = [(conversation_id, message, image_id)]
-
         # run any sending handlers
 
         try:
             yield from self._handlers.run_pluggable_omnibus("sending", self, broadcast_list, context)
         except self.Exceptions.SuppressEventHandling:
             logger.info("message sending: SuppressEventHandling")
-            return
+            return None
         except:
             raise
 
@@ -772,22 +901,82 @@ class HangupsBot(object):
 
         # begin message sending.. for REAL!
 
-        for response in broadcast_list:
+        pending = []
+        for index, response in enumerate(broadcast_list):
             logger.debug("message sending: {}".format(response[0]))
 
-            # send messages using FakeConversation as a workaround
+            # sending fills in history and passthru.original_request for the conversation it is
+            #   sending to, so each target needs its own copy once the sending handlers are done
+            if len(broadcast_list) > 1:
+                target_context = dict(context)
+                target_context["passthru"] = dict(context["passthru"])
+            else:
+                target_context = context
+
+            # anything a sending handler added to the broadcast list (e.g. syncroom relays) is fan-out
+            if bulk or index > 0:
+                priority = outbound.PRIORITY_BULK
+            else:
+                priority = outbound.PRIORITY_INTERACTIVE
 
-            _fc = FakeConversation(self, response[0])
+            pending.append(( response[0],
+                             self._outbound.submit( response[0],
+                                                    response[1],
+                                                    image_id = response[2],
+                                                    context = target_context,
+                                                    priority = priority ) ))
 
-            for retry_count in range(3):
-                try:
-                    yield from _fc.send_message( response[1],
-                                                 image_id = response[2],
-                                                 context = context )
-                    break
-                except hangups.NetworkError as e:
-                    logger.exception("CORO_SEND_MESSAGE: error sending {}".format(response[0]))
-                    yield from asyncio.sleep(1)
+        return pending
+
+    @asyncio.coroutine
+    def coro_send_message(self, conversation, message, context=None, image_id=None, bulk=False):
+        """queue a message for sending, returns once it was sent
+        bulk=True marks fan-out (broadcasts, relays) that should yield to interactive replies"""
+        if not message and not image_id:
+            # at least a message OR an image_id must be supplied
+            return
+
+        broadcast_list = [(self._conversation_id(conversation), message, image_id)]
+
+        pending = yield from self._send_broadcast_list(broadcast_list, context or {}, bulk)
+        if pending:
+            yield from asyncio.gather(*[ future for _, future in pending ])
+
+    @asyncio.coroutine
+    def coro_send_many(self, conversations, message, context=None, image_id=None):
+        """send the same message to many conversations in one call
+        * sending handlers run once, with every target in the broadcast list
+        * each target is sent a copy of the context, the message is parsed once
+        * sends are queued concurrently as bulk messages, subject to the outbound rate limits
+        returns { conversation id: True (sent) | False (not sent) | exception raised while sending }"""
+        conversation_ids = []
+        for conversation in conversations:
+            conversation_id = self._conversation_id(conversation)
+            if conversation_id not in conversation_ids:
+                conversation_ids.append(conversation_id)
+
+        results = { conversation_id: False for conversation_id in conversation_ids }
+        if not conversation_ids or (not message and not image_id):
+            return results
+
+        broadcast_list = [ (conversation_id, message, image_id) for conversation_id in conversation_ids ]
+
+        pending = yield from self._send_broadcast_list(broadcast_list, context or {}, True)
+        if not pending:
+            return results
+
+        sent = yield from asyncio.gather(*[ future for _, future in pending ], return_exceptions=True)
+        # keyed by the conversation each send was queued for - sending handlers may reorder or
+        #   extend the broadcast list, only the requested targets are reported
+        for (conversation_id, _), result in zip(pending, sent):
+            if conversation_id not in results:
+                continue
+            if isinstance(result, Exception):
+                logger.error("message sending to {} failed: {}".format(conversation_id, repr(result)))
+            if results[conversation_id] is not True:
+                results[conversation_id] = result
+
+        return results
 
 
     @asyncio.coroutine
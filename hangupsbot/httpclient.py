@@ -0,0 +1,105 @@
+"""shared http client for the bot and plugins, available as bot.http
+* one pooled aiohttp session: keep-alive connections and cached dns lookups are reused
+  across plugins instead of every request opening (and leaking) its own session
+* concurrent connections are capped in total and per host
+* every request gets a default timeout
+"""
+import asyncio, logging
+
+import aiohttp
+
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """lazily creates the shared ClientSession on first use, so it is always bound to the
+    running event loop, and recreates it after close() (e.g. on reconnect)"""
+
+    def __init__( self, limit=100, limit_per_host=8, dns_cache_ttl=300,
+                  keepalive_timeout=30, timeout=30, user_agent=None ):
+
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.user_agent = user_agent
+
+        self._session = None
+
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def session(self):
+        """the shared aiohttp.ClientSession, for anything the helpers below do not cover"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector( limit = self.limit,
+                                              limit_per_host = self.limit_per_host,
+                                              ttl_dns_cache = self.dns_cache_ttl,
+                                              keepalive_timeout = self.keepalive_timeout )
+            headers = { "User-Agent": self.user_agent } if self.user_agent else None
+            self._session = aiohttp.ClientSession( connector = connector,
+                                                   timeout = aiohttp.ClientTimeout(total=self.timeout),
+                                                   headers = headers )
+        return self._session
+
+    @asyncio.coroutine
+    def request(self, method, url, **kwargs):
+        """returns the aiohttp.ClientResponse, the caller must read() or release() it"""
+        self.requests += 1
+        try:
+            return (yield from self.session.request(method, url, **kwargs))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors += 1
+            raise
+
+    @asyncio.coroutine
+    def get(self, url, **kwargs):
+        return (yield from self.request("GET", url, **kwargs))
+
+    @asyncio.coroutine
+    def post(self, url, **kwargs):
+        return (yield from self.request("POST", url, **kwargs))
+
+    @asyncio.coroutine
+    def fetch(self, url, method="GET", **kwargs):
+        """returns the response body as bytes, raises aiohttp.ClientResponseError on http errors"""
+        response = yield from self.request(method, url, **kwargs)
+        try:
+            response.raise_for_status()
+            return (yield from response.read())
+        finally:
+            response.release()
+
+    @asyncio.coroutine
+    def fetch_text(self, url, method="GET", encoding=None, **kwargs):
+        response = yield from self.request(method, url, **kwargs)
+        try:
+            response.raise_for_status()
+            return (yield from response.text(encoding=encoding))
+        finally:
+            response.release()
+
+    @asyncio.coroutine
+    def fetch_json(self, url, method="GET", **kwargs):
+        """decodes the body regardless of the content-type the server claims"""
+        response = yield from self.request(method, url, **kwargs)
+        try:
+            response.raise_for_status()
+            return (yield from response.json(content_type=None))
+        finally:
+            response.release()
+
+    @asyncio.coroutine
+    def close(self):
+        if self._session is not None and not self._session.closed:
+            yield from self._session.close()
+        self._session = None
+
+    def summary(self):
+        return { "requests": self.requests,
+                 "errors": self.errors,
+                 "limit": self.limit,
+                 "limit_per_host": self.limit_per_host }
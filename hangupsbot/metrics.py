@@ -0,0 +1,109 @@
+"""lightweight in-process metrics for the bot core
+histograms use a fixed, preallocated set of latency buckets so recording a sample is
+a bisect and an integer increment - cheap enough to run on every command or handler
+"""
+import bisect, logging
+
+
+logger = logging.getLogger(__name__)
+
+
+# upper bounds (seconds) of each latency bucket, the final bucket catches everything else
+DEFAULT_BUCKETS = ( 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0, 30.0, 60.0 )
+
+
+class LatencyHistogram:
+    """fixed-bucket histogram of durations in seconds"""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """upper bound of the bucket containing the p-th percentile (0 < p <= 100)
+        the overflow bucket reports the largest observed sample instead"""
+        if not self.count:
+            return 0.0
+        threshold = self.count * p / 100.0
+        running = 0
+        for index, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= threshold:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], self.max)
+                return self.max
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        return { "count": self.count,
+                 "mean": self.mean,
+                 "p50": self.percentile(50),
+                 "p95": self.percentile(95),
+                 "p99": self.percentile(99),
+                 "max": self.max }
+
+
+class LatencyRegistry:
+    """keyed collection of LatencyHistogram plus free-form counters"""
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.histograms = {}
+        self.counters = {}
+
+    def record(self, key, seconds):
+        try:
+            histogram = self.histograms[key]
+        except KeyError:
+            histogram = self.histograms[key] = LatencyHistogram(self.bounds)
+        histogram.record(seconds)
+
+    def increment(self, key, amount=1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def summary(self, sort_by="total"):
+        """list of (key, summary) tuples, most expensive first"""
+        items = sorted( self.histograms.items(),
+                        key=lambda kv: getattr(kv[1], sort_by),
+                        reverse=True )
+        return [ (key, histogram.summary()) for key, histogram in items ]
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+
+
+def format_summary_lines(registry, limit=None, label=str):
+    """render a registry as human-readable lines for chat output"""
+    lines = []
+    for key, stats in registry.summary()[:limit]:
+        lines.append( "<b><pre>{}</pre></b>: n={} p50={:.3f}s p95={:.3f}s p99={:.3f}s max={:.3f}s".format(
+            label(key), stats["count"], stats["p50"], stats["p95"], stats["p99"], stats["max"] ))
+    return lines
+
+
+def summary_as_dicts(registry, fields=("key",), limit=None):
+    """render a registry as json-serialisable dicts, tuple keys are split into fields"""
+    rows = []
+    for key, stats in registry.summary()[:limit]:
+        row = dict(zip(fields, key if isinstance(key, tuple) else (key,)))
+        row.update(stats)
+        rows.append(row)
+    return rows
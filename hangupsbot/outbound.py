@@ -0,0 +1,273 @@
+"""central scheduler for outgoing messages
+* per-conversation and global token buckets smooth out bursts (broadcasts, syncroom fan-out, etc)
+* interactive replies are granted global tokens before bulk messages
+* optionally, consecutive short text messages with identical contexts are merged into one send
+* failed sends are retried with exponential backoff and jitter
+"""
+import asyncio, heapq, itertools, logging, random, time
+
+from collections import deque
+
+import hangups
+
+from cache import ExpiringStore
+
+
+logger = logging.getLogger(__name__)
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+
+class TokenBucket:
+    """rate tokens per second, up to burst tokens saved up, rate 0 = unlimited"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def delay(self):
+        """seconds until a token is available, 0 if one is available now"""
+        if not self.rate:
+            return 0
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        if self.rate:
+            self.tokens -= 1
+
+
+class _Outbound:
+    __slots__ = ("message", "image_id", "context", "priority", "future")
+
+    def __init__(self, message, image_id, context, priority):
+        self.message = message
+        self.image_id = image_id
+        self.context = context
+        self.priority = priority
+        self.future = asyncio.Future()
+
+
+class OutboundScheduler:
+    """queue messages per conversation and send them in order, within the configured rates
+    send is a coroutine function(conversation_id, message, image_id, context) that raises
+    hangups.NetworkError on a retryable failure"""
+
+    def __init__( self, send,
+                  global_rate=10, global_burst=20,
+                  conversation_rate=2, conversation_burst=5,
+                  merge=False, merge_window=0, merge_max_length=200,
+                  retries=3, backoff=1.0, backoff_max=30.0 ):
+
+        self.send = send
+
+        self.conversation_rate = conversation_rate
+        self.conversation_burst = conversation_burst
+        self.merge = merge
+        self.merge_window = merge_window
+        self.merge_max_length = merge_max_length
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+        self._global = TokenBucket(global_rate, global_burst)
+        self._global_waiters = []
+        self._global_granter = None
+        self._sequence = itertools.count()
+
+        # idle buckets are refilled by the time they expire, so forgetting them is harmless
+        self._buckets = ExpiringStore("outbound-buckets", ttl=300, max_size=10000)
+        self._queues = {}
+        self._runners = {}
+
+        self.queued = 0
+        self.sent = 0
+        self.merged = 0
+        self.retried = 0
+        self.failed = 0
+
+    def submit(self, conversation_id, message, image_id=None, context=None, priority=PRIORITY_INTERACTIVE):
+        """queue a message, returns a future resolved with True once it has been sent, or False
+        if every retry failed"""
+        item = _Outbound(message, image_id, context, priority)
+
+        queue = self._queues.get(conversation_id)
+        if queue is None:
+            queue = self._queues[conversation_id] = deque()
+        queue.append(item)
+        self.queued += 1
+
+        if conversation_id not in self._runners:
+            self._runners[conversation_id] = asyncio.ensure_future(self._run(conversation_id, queue))
+
+        return item.future
+
+    def _mergeable(self, item, previous=None):
+        context = item.context or {}
+        if( item.image_id is not None
+                or not isinstance(item.message, str)
+                or len(item.message) > self.merge_max_length
+                or context.get("reprocessor")
+                or context.get("passthru")
+                or context.get("parser") is False ):
+            return False
+        if previous is not None and context != (previous.context or {}):
+            # a merged send only carries one context, nothing may be lost by merging
+            return False
+        return True
+
+    def _next_batch(self, queue):
+        """next messages to send in one go, skipping any whose caller has already given up"""
+        batch = []
+        while queue and not batch:
+            item = queue.popleft()
+            if not item.future.cancelled():
+                batch.append(item)
+        if batch and self.merge and self._mergeable(batch[0]):
+            while queue and (queue[0].future.cancelled() or self._mergeable(queue[0], batch[-1])):
+                item = queue.popleft()
+                if not item.future.cancelled():
+                    batch.append(item)
+        return batch
+
+    @asyncio.coroutine
+    def _run(self, conversation_id, queue):
+        try:
+            while queue:
+                if self.merge and self.merge_window and len(queue) == 1 and self._mergeable(queue[0]):
+                    # give a follow-up message the chance to catch up
+                    yield from asyncio.sleep(self.merge_window)
+
+                bucket = self._buckets.get(conversation_id)
+                if bucket is None:
+                    bucket = TokenBucket(self.conversation_rate, self.conversation_burst)
+                self._buckets[conversation_id] = bucket
+
+                delay = bucket.delay()
+                if delay:
+                    yield from asyncio.sleep(delay)
+
+                # more messages may have arrived while waiting, they can be merged now
+                batch = self._next_batch(queue)
+                if not batch:
+                    continue
+
+                yield from self._acquire_global(min(item.priority for item in batch))
+
+                # callers may have been cancelled (e.g. command timeout) while waiting for a token
+                batch = [ item for item in batch if not item.future.cancelled() ]
+                if not batch:
+                    continue
+
+                bucket.delay()
+                bucket.consume()
+
+                if len(batch) > 1:
+                    yield from self._send_merged(conversation_id, batch)
+                else:
+                    yield from self._send_item(conversation_id, batch[0])
+        finally:
+            del self._runners[conversation_id]
+            if not queue and self._queues.get(conversation_id) is queue:
+                del self._queues[conversation_id]
+
+    @asyncio.coroutine
+    def _acquire_global(self, priority):
+        if not self._global.rate:
+            return
+
+        future = asyncio.Future()
+        heapq.heappush(self._global_waiters, (priority, next(self._sequence), future))
+        if self._global_granter is None:
+            self._global_granter = asyncio.ensure_future(self._grant_global())
+
+        yield from future
+
+    @asyncio.coroutine
+    def _grant_global(self):
+        """hand out global tokens, lowest priority value first"""
+        try:
+            while self._global_waiters:
+                delay = self._global.delay()
+                if delay:
+                    yield from asyncio.sleep(delay)
+                    continue
+
+                priority, sequence, future = heapq.heappop(self._global_waiters)
+                if future.done():
+                    continue
+                self._global.consume()
+                future.set_result(None)
+        finally:
+            self._global_granter = None
+
+    @asyncio.coroutine
+    def _send(self, conversation_id, message, image_id, context):
+        """returns True if sent, False if every retry failed, raises on any other error"""
+        for attempt in range(self.retries):
+            try:
+                yield from self.send(conversation_id, message, image_id, context)
+                self.sent += 1
+                return True
+            except hangups.NetworkError:
+                logger.exception("error sending to {}, attempt {}/{}".format(
+                    conversation_id, attempt + 1, self.retries))
+                if attempt + 1 < self.retries:
+                    self.retried += 1
+                    delay = min(self.backoff_max, self.backoff * 2 ** attempt)
+                    yield from asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        self.failed += 1
+        return False
+
+    @asyncio.coroutine
+    def _send_item(self, conversation_id, item):
+        try:
+            sent = yield from self._send(conversation_id, item.message, item.image_id, item.context)
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result(sent)
+
+    @asyncio.coroutine
+    def _send_merged(self, conversation_id, batch):
+        message = "\n".join(item.message for item in batch)
+        try:
+            sent = yield from self._send(conversation_id, message, None, batch[0].context)
+        except Exception:
+            # the error may belong to any one of the messages, send them separately so every
+            #   caller gets its own result
+            logger.exception("merged send to {} failed, sending {} messages separately".format(
+                conversation_id, len(batch)))
+            for item in batch:
+                if not item.future.cancelled():
+                    yield from self._send_item(conversation_id, item)
+            return
+
+        self.merged += len(batch) - 1
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(sent)
+
+    def summary(self):
+        return { "conversations": len(self._queues),
+                 "depth": sum(len(queue) for queue in self._queues.values()),
+                 "waiting": len(self._global_waiters),
+                 "queued": self.queued,
+                 "sent": self.sent,
+                 "merged": self.merged,
+                 "retried": self.retried,
+                 "failed": self.failed }
@@ -1,6 +1,10 @@
 """file imported by utils.py
 more parsers and parser utility functions can be imported here
 """
+import copy
+
+from collections import OrderedDict
+
 import hangups
 
 import parsers.kludgy_html_parser
@@ -20,4 +24,58 @@ def simple_parse_to_segments(formatted_text):
         # fallback to internal parser
         # supports html
         segments = kludgy_html_parser.simple_parse_to_segments(formatted_text)
-    return segments
\ No newline at end of file
+    return segments
+
+
+class SegmentCache:
+    """LRU cache of formatted text -> (segments, serialised segments)
+    outgoing text is often identical across conversations (broadcasts, relays, templates),
+    so fan-out to N chats only parses and serialises once"""
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get(self, formatted_text):
+        try:
+            entry = self._data[formatted_text]
+        except KeyError:
+            self.misses += 1
+            segments = simple_parse_to_segments(formatted_text)
+            entry = ( tuple(segments),
+                      tuple(segment.serialize() for segment in segments) )
+            if self.max_size:
+                self._data[formatted_text] = entry
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+                    self.evicted += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(formatted_text)
+        return entry
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return { "name": "segments",
+                 "size": len(self._data),
+                 "hits": self.hits,
+                 "misses": self.misses,
+                 "evicted": self.evicted,
+                 "hit_rate": self.hits / lookups if lookups else 0.0 }
+
+segment_cache = SegmentCache()
+
+
+def parse_to_serialised_segments(formatted_text):
+    """cached simple_parse_to_segments(), returns (segments, serialised segments) as new lists
+    segments are copied as they end up in passthru["original_request"] where consumers may
+    modify them, the serialised protobufs are shared between callers and must not be modified"""
+    segments, serialised = segment_cache.get(formatted_text)
+    return [ copy.copy(segment) for segment in segments ], list(serialised)
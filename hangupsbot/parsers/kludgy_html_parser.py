@@ -4,6 +4,7 @@ execute parser test by running this file directly with the interpreter
 
 import logging
 import html
+import re
 
 from html.parser import HTMLParser
 
@@ -14,11 +15,137 @@ import hangups_shim
 
 def simple_parse_to_segments(html, debug=False, **kwargs):
     html = fix_urls(html)
+    if not debug:
+        segments = tokenize_to_segments(html)
+        if segments is not None:
+            return segments
     html = '<html>' + html + '</html>' # html.parser seems to ignore the final entityref without html closure
     parser = simpleHTMLParser(debug)
     return parser.feed(html)
 
 
+# one token per match, in the order simpleHTMLParser would see the same events
+_SIMPLE_TOKEN = re.compile(
+    r'([^&<]+)'                                             # 1: data, HTMLParser splits data at & and <
+    r'|<([a-zA-Z][a-zA-Z0-9]*)(\s*/)?>'                     # 2: start tag without attributes, 3: self-closing
+    r'|</([a-zA-Z][a-zA-Z0-9]*)>'                           # 4: end tag
+    r'|<[aA]\s+[hH][rR][eE][fF]\s*=\s*(?:"([^"]*)"|\'([^\']*)\')\s*>'  # 5/6: link with only an href
+    r'|&([a-zA-Z][-.a-zA-Z0-9]*);?'                         # 7: entityref, the ; is optional
+    r'|(&(?![a-zA-Z#])|<(?![a-zA-Z/!?]))' )                  # 8: literal & or < that cannot start markup
+
+# tags that switch HTMLParser into (r)cdata mode
+_CDATA_TAGS = ( "script", "style", "textarea", "title", "xmp", "iframe", "noembed", "noframes",
+                "noscript", "plaintext" )
+
+def tokenize_to_segments(text):
+    """single pass equivalent of simpleHTMLParser for the markup bots usually send: plain tags,
+    <a href="...">, entity references and literal & or <
+    returns None if anything else is found (tags with other attributes, comments, character
+    references, ...), the caller should fall back to simpleHTMLParser"""
+
+    # [text, segment type, is_bold, is_italic, is_underline, link_target]
+    records = []
+    bold = italic = underline = False
+    link_target = None
+    link_text = None
+
+    def extend(data):
+        if records:
+            previous = records[-1]
+            if( previous[2] == bold and previous[3] == italic and previous[4] == underline
+                    and previous[5] == link_target and previous[0] != "\n" ):
+                previous[0] += data
+                return
+        records.append([ data, None, bold, italic, underline, link_target ])
+
+    position = 0
+    length = len(text)
+    while position < length:
+        match = _SIMPLE_TOKEN.match(text, position)
+        if match is None:
+            return None
+        position = match.end()
+
+        data, tag, self_closing, end_tag, href_double, href_single, entity, literal = match.groups()
+
+        if data is not None or literal is not None:
+            data = data or literal
+            if link_target is not None:
+                link_text += data
+            else:
+                extend(data)
+
+        elif entity is not None:
+            if link_target is not None:
+                link_text += "&" + entity
+            else:
+                extend(html.unescape("&" + entity))
+
+        elif tag is not None:
+            name = tag.lower()
+            if name in _CDATA_TAGS:
+                return None
+            if self_closing:
+                if name == "br":
+                    records.append([ "\n", hangups_shim.schemas.SegmentType.LINE_BREAK, False, False, False, None ])
+                else:
+                    extend(match.group(0))
+            elif name == "b":
+                bold = True
+            elif name == "i":
+                italic = True
+            elif name == "u":
+                underline = True
+            elif name == "a":
+                link_text = ""
+            else:
+                extend(match.group(0))
+
+        elif end_tag is not None:
+            name = end_tag.lower()
+            if name == "html":
+                pass
+            elif name == "b":
+                bold = False
+            elif name == "i":
+                italic = False
+            elif name == "u":
+                underline = False
+            elif name == "a":
+                if link_text is None:
+                    # </a> without <a>, leave it to simpleHTMLParser
+                    return None
+                records.append([ link_text, hangups_shim.schemas.SegmentType.LINK, bold, italic, underline, link_target ])
+                link_target = None
+                link_text = None
+            else:
+                extend("</" + name + ">")
+
+        else:
+            link_text = ""
+            href = href_double if href_double is not None else href_single
+            link_target = html.unescape(href) if href else href
+
+    segments = []
+    for text, type_, is_bold, is_italic, is_underline, target in records:
+        if type_ is None:
+            segments.append(hangups.ChatMessageSegment( text,
+                                                        is_bold=is_bold,
+                                                        is_italic=is_italic,
+                                                        is_underline=is_underline,
+                                                        link_target=target ))
+        elif type_ == hangups_shim.schemas.SegmentType.LINE_BREAK:
+            segments.append(hangups.ChatMessageSegment(text, type_))
+        else:
+            segments.append(hangups.ChatMessageSegment( text,
+                                                        type_,
+                                                        link_target=target,
+                                                        is_bold=is_bold,
+                                                        is_italic=is_italic,
+                                                        is_underline=is_underline ))
+    return segments
+
+
 def segment_to_html(segment):
     """Create simple HTML from ChatMessageSegment"""
     text = html.escape(segment.text) if segment.text else ""
@@ -48,7 +175,9 @@ def segment_to_html(segment):
 
 class simpleHTMLParser(HTMLParser):
     def __init__(self, debug=False, **kwargs):
-        super().__init__(kwargs)
+        # entity references are handled by handle_entityref(), as with the python 3.4 default
+        #   (passing kwargs positionally raises TypeError on python 3.5+)
+        super().__init__(convert_charrefs=False)
 
         self._debug = debug
 
@@ -110,7 +239,7 @@ class simpleHTMLParser(HTMLParser):
             self._segments.append(
               hangups.ChatMessageSegment(
                 self._link_text,
-                hangups.SegmentType.LINK,
+                hangups_shim.schemas.SegmentType.LINK,
                 link_target=self._flags["link_target"],
                 is_bold=self._flags["bold"],
                 is_italic=self._flags["italic"],
@@ -139,7 +268,7 @@ class simpleHTMLParser(HTMLParser):
         self._segments.append(
             hangups.ChatMessageSegment(
                 "\n",
-                hangups.SegmentType.LINE_BREAK))
+                hangups_shim.schemas.SegmentType.LINE_BREAK))
 
     def segments_extend(self, text, type, forceNew=False):
         if len(self._segments) == 0 or forceNew is True:
@@ -163,34 +292,34 @@ class simpleHTMLParser(HTMLParser):
             else:
                 previous_segment.text += text
 
+# where a url may start within a token, or a character that stops the search (tag fragment)
+_URL_START = re.compile(r'https?://|["=\'<]')
+# characters that end a detected url
+_URL_END = re.compile(r'[)>\]!*<]')
+
 def fix_urls(text):
-    tokens = text.split() # "a  b" => (a,b)
+    """wrap bare http(s) urls in <a> tags, whitespace is normalised to single spaces
+    linear per token: the url start and end are located with one regex search each"""
     urlified = []
-    for token in tokens:
-        pretoken = ""
-        posttoken = ""
-        # consume a token looking for a url-like pattern...
-        while len(token)>10: # stop below shortest possible domain http://g.cn length
-            if token.startswith(("http://", "https://")):
-                break;
-            if token[0:1] in ('"', '=', "'", "<"):
-                # stop if any consumed character matches possible tag fragment
-                break
-            pretoken = pretoken + token[0:1]
-            token = token[1:]
-        if token.startswith(("http://", "https://")):
-            _i = 0
-            for c in token:
-                if c in (")", ">", "]", "!", "*", "<"):
-                    posttoken = token[_i:]
-                    token = token[0:_i]
-                    break
-                _i = _i + 1
-            token = '<a href="' + token + '">' + token + '</a>'
-        token = pretoken + token + posttoken
+    for token in text.split(): # "a  b" => (a,b)
+        # urls are only looked for while more than 10 characters (http://g.cn) remain
+        start = max(len(token) - 10, 0)
+        match = _URL_START.search(token)
+        if match and match.start() < start:
+            start = match.start()
+
+        if token.startswith(("http://", "https://"), start):
+            pretoken = token[:start]
+            url = token[start:]
+            posttoken = ""
+            match = _URL_END.search(url)
+            if match:
+                posttoken = url[match.start():]
+                url = url[:match.start()]
+            token = pretoken + '<a href="' + url + '">' + url + '</a>' + posttoken
+
         urlified.append(token)
-    text = " ".join(urlified)
-    return text
+    return " ".join(urlified)
 
 def test_parser():
     test_strings = [
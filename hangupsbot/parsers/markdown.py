@@ -1,15 +1,98 @@
-import logging
+import logging, re, threading
 
 from .kludgy_html_parser import segment_to_html
+from html import unescape
 from html.parser import HTMLParser
 
 
 logger = logging.getLogger(__name__)
 
 
+BASIC_MARKDOWN = { "b": "**",
+                   "em": "_",
+                   "i": "_",
+                   "pre": "`",
+                   "code": "`",
+                   "br": ["", "\n"] }
+
+
+# the plain tags bots actually send: <b>, </b>, <br />, <a href="...">
+_SIMPLE_TAG = re.compile( r'<(?:(/)?([a-zA-Z][a-zA-Z0-9]*)\s*(/)?'
+                          r'|a\s+href\s*=\s*(?:"([^"]*)"|\'([^\']*)\')\s*)>', re.IGNORECASE )
+
+def _simple_html_to_markdown(html, basic_markdown):
+    """single regex pass over html that only contains simple tags, producing exactly what
+    htmlToMarkdownParser would - returns None for anything else (comments, unknown attributes,
+    stray "<", script/style or a trailing entity), which is left to the full parser"""
+    pieces = []
+    link_buffer = False
+    position = 0
+
+    for match in _SIMPLE_TAG.finditer(html):
+        start = match.start()
+        if start > position:
+            data = html[position:start]
+            if "<" in data:
+                return None
+            data = unescape(data)
+            if link_buffer:
+                link_buffer = "[" + data + "]" + link_buffer
+            else:
+                pieces.append(data)
+        position = match.end()
+
+        closing, tag, self_closing, href_double, href_single = match.groups()
+
+        if tag is None:
+            href = href_double if href_double is not None else href_single
+            link_buffer = "(" + unescape(href) + ")"
+            continue
+
+        tag = tag.lower()
+        if tag in ("script", "style") or (closing and self_closing):
+            return None
+
+        if tag == "a":
+            if closing or self_closing:
+                if link_buffer:
+                    pieces.append(link_buffer)
+                link_buffer = False
+            continue
+
+        if tag in basic_markdown:
+            markdown = basic_markdown[tag]
+            if isinstance(markdown, list):
+                if self_closing:
+                    pieces.append(markdown[0])
+                    pieces.append(markdown[1])
+                else:
+                    pieces.append(markdown[1 if closing else 0])
+            else:
+                pieces.append(markdown)
+                if self_closing:
+                    pieces.append(markdown)
+
+    data = html[position:]
+    if data:
+        if "<" in data or "&" in data:
+            return None
+        if link_buffer:
+            link_buffer = "[" + data + "]" + link_buffer
+        else:
+            pieces.append(data)
+
+    return "".join(pieces)
+
+
 class htmlToMarkdownParser(HTMLParser):
+    """single pass html to markdown conversion
+    output pieces are collected in a list and joined once, instances can be reused since
+    every feed() starts from a clean parser state"""
+
     def feed(self, html, basic_markdown={}, debug=False):
-        self._markdown = ""
+        self.reset()
+
+        self._pieces = []
         self._basic = basic_markdown
 
         self._link_href = False
@@ -17,9 +100,11 @@ class htmlToMarkdownParser(HTMLParser):
 
         self.debug = debug
 
-        super().feed(html)
-
-        return self._markdown
+        try:
+            super().feed(html)
+            return "".join(self._pieces)
+        finally:
+            self._pieces = None
 
     def handle_starttag(self, tag, attrs):
         if self.debug:
@@ -38,7 +123,8 @@ class htmlToMarkdownParser(HTMLParser):
             logger.info("end tag: {}".format(tag))
 
         if tag == "a":
-            self._markdown += self._link_buffer
+            if self._link_buffer:
+                self._pieces.append(self._link_buffer)
             self._link_buffer = False
         else:
             self.add_tag(tag, 1)
@@ -50,14 +136,17 @@ class htmlToMarkdownParser(HTMLParser):
         if self._link_buffer:
             self._link_buffer = "[" + data + "]" + self._link_buffer
         else:
-            self._markdown += data
+            self._pieces.append(data)
 
     def add_tag(self, tag, pos):
         if tag in self._basic:
             if isinstance(self._basic[tag], list):
-                self._markdown += self._basic[tag][pos]
+                self._pieces.append(self._basic[tag][pos])
             else:
-                self._markdown += self._basic[tag]
+                self._pieces.append(self._basic[tag])
+
+# one reusable parser per thread, HTMLParser instances are not thread-safe
+_parsers = threading.local()
 
 def html_to_hangups_markdown(html, debug=False):
     if isinstance(html, list):
@@ -66,16 +155,20 @@ def html_to_hangups_markdown(html, debug=False):
                       "supplied message will be downconverted to html" )
         html = "".join([ segment_to_html(seg)
                          for seg in html ])
-    parser = htmlToMarkdownParser()
-    return parser.feed(
-        html,
-        {   "b": "**",
-            "em": "_",
-            "i": "_",
-            "pre": "`",
-            "code": "`",
-            "br": ["", "\n"] },
-        debug = debug )
+
+    if not debug:
+        markdown = _simple_html_to_markdown(html, BASIC_MARKDOWN)
+        if markdown is not None:
+            return markdown
+
+    parser = getattr(_parsers, "parser", None)
+    if parser is None or getattr(parser, "_pieces", None) is not None:
+        # first use on this thread, or re-entered (e.g. from a debug logging handler)
+        parser = htmlToMarkdownParser()
+        if getattr(_parsers, "parser", None) is None:
+            _parsers.parser = parser
+
+    return parser.feed(html, BASIC_MARKDOWN, debug=debug)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+"""bounded, per-conversation ordered event processing
+
+events for the same conversation are handled one at a time in arrival order, while
+different conversations are processed concurrently up to a fixed number of workers
+"""
+import asyncio, logging, time
+
+from collections import deque
+
+from metrics import LatencyRegistry
+
+
+logger = logging.getLogger(__name__)
+
+
+class EventPipeline:
+    """queue coroutine functions by key (conversation id) and run them in order
+    overflow policy when a conversation queue is full:
+    * "drop_oldest" - discard the oldest queued event (default)
+    * "drop_newest" - discard the incoming event
+    * "block" - wait for space, which slows down the caller (e.g. the hangups event loop)
+    """
+
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    def __init__(self, workers=16, queue_size=100, overflow="drop_oldest"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("unknown overflow policy: {}".format(overflow))
+
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overflow = overflow
+
+        self._queues = {}
+        self._runners = {}
+        self._blocked = {}
+        self._slots = asyncio.Semaphore(workers)
+
+        # "wait" = time spent queued, "run" = time spent processing
+        self.stats = LatencyRegistry()
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asyncio.coroutine
+    def submit(self, key, function, *args):
+        """queue function(*args) for key, returns False if the event was dropped"""
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+
+        if len(queue) >= self.queue_size:
+            if self.overflow == "block":
+                while key in self._queues and len(self._queues[key]) >= self.queue_size:
+                    waiter = asyncio.Future()
+                    self._blocked.setdefault(key, []).append(waiter)
+                    yield from waiter
+                queue = self._queues.setdefault(key, deque())
+            elif self.overflow == "drop_newest":
+                self.stats.increment("dropped")
+                logger.warning("queue full for {}, event dropped".format(key))
+                return False
+            else:
+                queue.popleft()
+                self.stats.increment("dropped")
+                logger.warning("queue full for {}, oldest event dropped".format(key))
+
+        queue.append((time.monotonic(), function, args))
+        if len(queue) > self.max_depth:
+            self.max_depth = len(queue)
+
+        if key not in self._runners:
+            self._runners[key] = asyncio.ensure_future(self._run(key, queue))
+
+        return True
+
+    def _wake_blocked(self, key):
+        for waiter in self._blocked.pop(key, []):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @asyncio.coroutine
+    def _run(self, key, queue):
+        try:
+            while queue:
+                enqueued, function, args = queue.popleft()
+                self._wake_blocked(key)
+
+                with (yield from self._slots):
+                    started = time.monotonic()
+                    self.stats.record("wait", started - enqueued)
+                    try:
+                        yield from function(*args)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        logger.exception("event processing failed for {}".format(key))
+                    self.stats.record("run", time.monotonic() - started)
+                    self.stats.increment("processed")
+        finally:
+            del self._runners[key]
+            if not queue and self._queues.get(key) is queue:
+                del self._queues[key]
+            self._wake_blocked(key)
+
+    def summary(self):
+        return { "conversations": len(self._queues),
+                 "depth": self.depth,
+                 "max_depth": self.max_depth,
+                 "processed": self.stats.counters.get("processed", 0),
+                 "dropped": self.stats.counters.get("dropped", 0) }
@@ -208,11 +208,18 @@ def register_admin_command(command_names, tags=None):
         command_names = [command_names]
     tracking.register_command("admin", command_names, tags=tags)
 
-def register_handler(function, type="message", priority=50, extra_metadata=None):
-    """register external handler"""
+def register_handler(function, type="message", priority=50, extra_metadata=None, independent=False,
+                     triggers=None):
+    """register external handler
+    independent=True allows the handler to run concurrently with other independent
+    handlers of the same priority
+    triggers={"prefix"|"contains"|"regex": ...} only invokes the handler for matching messages"""
     extra_metadata = extra_metadata or {}
     bot_handlers = tracking.bot._handlers
-    return bot_handlers.register_handler(function, type, priority, extra_metadata=extra_metadata)
+    return bot_handlers.register_handler( function, type, priority,
+                                          extra_metadata=extra_metadata,
+                                          independent=independent,
+                                          triggers=triggers )
 
 def deregister_handler(function, type="message"):
     """deregister external handler"""
@@ -499,7 +506,10 @@ def load(bot, module_path, module_name=None):
 
 
 @asyncio.coroutine
-def unload(bot, module_path):
+def unload(bot, module_path, keep_handlers=False):
+    """unload a plugin and everything it registered
+    keep_handlers=True leaves its event handlers active, the caller must remove them later with
+    bot._handlers.deregister_handlers(..., untrack=False) - used by reload to swap them atomically"""
     if module_path in tracking.list:
         plugin = tracking.list[module_path]
         loop = asyncio.get_event_loop()
@@ -539,12 +549,8 @@ def unload(bot, module_path):
                         logger.debug("deregistering tagged command {}".format(command_name))
                         del command.command_tagsets[command_name]
 
-            for type in bot._handlers.pluggables:
-                for handler in bot._handlers.pluggables[type]:
-                    if handler[2]["module.path"] == module_path:
-                        logger.debug("removing handler {} {}".format(type, handler))
-                        bot._handlers.pluggables[type].remove(handler)
-                        tracking.deregister_handler(handler[0], handler[2]["module.path"])
+            if not keep_handlers:
+                bot._handlers.deregister_handlers(bot._handlers.module_handlers(module_path))
 
             shared = plugin["shared"]
             for shared_def in shared:
@@ -63,6 +63,7 @@ config.json entries used by this plugin
 """
 
 
+import aiohttp
 import hangups
 import logging
 import plugins
@@ -141,9 +142,10 @@ def _handle_incoming_message(bot, event, command):
     logger.info('message received, stiripped: ' + txt)
     camurl = CAMURLS.get(txt, None)
     if camurl:
-        image_data = requests.get(camurl, auth=HTTPBasicAuth(CAMUSR, CAMPWD))
-        logger.info('image data len: ' + str(len(image_data.content)))
-        image_id = yield from bot._client.upload_image(io.BytesIO(image_data.content), filename=txt+'.jpg')
+        # the mail relay thread keeps using requests, on the event loop use the shared client
+        image_data = yield from bot.http.fetch(camurl, auth=aiohttp.BasicAuth(CAMUSR, CAMPWD))
+        logger.info('image data len: ' + str(len(image_data)))
+        image_id = yield from bot._client.upload_image(io.BytesIO(image_data), filename=txt+'.jpg')
         yield from bot.coro_send_message(event.conv.id_, None, image_id=image_id)
 
 
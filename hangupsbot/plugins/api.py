@@ -31,8 +31,6 @@ logger = logging.getLogger(__name__)
 def _initialise(bot):
     _start_api(bot)
 
-reprocessor_queue = {}
-
 
 def response_received(bot, event, id, results, original_id):
     if results:
@@ -40,7 +38,7 @@ def response_received(bot, event, id, results, original_id):
             output = results["api.response"]
         else:
             output = results
-        reprocessor_queue[original_id] = output
+        bot._handlers.resolve_waiters(("api.response", original_id), output)
 
 
 def handle_as_command(bot, event, id):
@@ -149,25 +147,30 @@ class APIRequestHandler(AsyncRequestHandler):
                                                                       return_as_dict=True )
         reprocessor_id = reprocessor_context["id"]
 
-        if id in self._bot.conversations.catalog:
-            results = yield from self._bot.coro_send_message(
-                id,
-                content,
-                context = { "reprocessor": reprocessor_context })
-
-        else:
-            # attempt to send to a user id
-            results = yield from self._bot.coro_send_to_user(
-                id,
-                content,
-                context = { "reprocessor": reprocessor_context })
-
-        start_time = time.time()
-        while time.time() - start_time < 3:
-            if reprocessor_id in reprocessor_queue:
-                response = reprocessor_queue[reprocessor_id]
-                del reprocessor_queue[reprocessor_id]
+        # register before sending, the response can arrive before coro_send_message() returns
+        waiter_key = ("api.response", reprocessor_id)
+        waiter = self._bot._handlers.register_waiter(waiter_key)
+        try:
+            if id in self._bot.conversations.catalog:
+                results = yield from self._bot.coro_send_message(
+                    id,
+                    content,
+                    context = { "reprocessor": reprocessor_context })
+
+            else:
+                # attempt to send to a user id
+                results = yield from self._bot.coro_send_to_user(
+                    id,
+                    content,
+                    context = { "reprocessor": reprocessor_context })
+
+            # sends may queue behind the outbound rate limits, the response window starts once sent
+            start_time = time.time()
+            try:
+                response = yield from asyncio.wait_for(waiter, 3)
                 return "[" + str(time.time() - start_time) + "] " + response
-            yield from asyncio.sleep(0.1)
-
-        return results
+            except asyncio.TimeoutError:
+                return results
+        finally:
+            # also discarded if the send raised
+            self._bot._handlers.discard_waiter(waiter_key, waiter)
@@ -225,7 +225,7 @@ def autoreply(bot, event, cmd=None, *args):
 * FOR FUTURE-PROOFING, INCLUDE [image] PLUGIN IN YOUR CONFIG.JSON
 """
 
-import aiohttp, io, os, re
+import io, os, re
 
 def image_validate_link(image_uri, reject_googleusercontent=True):
     """
@@ -277,7 +277,7 @@ def image_validate_link(image_uri, reject_googleusercontent=True):
 def image_upload_single(image_uri, bot):
     logger.info("getting {}".format(image_uri))
     filename = os.path.basename(image_uri)
-    r = yield from aiohttp.request('get', image_uri)
+    r = yield from bot.http.get(image_uri)
     raw = yield from r.read()
     image_data = io.BytesIO(raw)
     image_id = yield from bot._client.upload_image(image_data, filename=filename)
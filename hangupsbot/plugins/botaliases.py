@@ -31,8 +31,9 @@ def _initialise(bot):
         bot_command_aliases = []
 
     if len(bot_command_aliases) == 0:
-        bot.append("/bot")
+        bot_command_aliases.append("/bot")
 
+    # assignment also rebuilds the precomputed alias lookups in the EventHandler
     bot._handlers.bot_command = bot_command_aliases
     logger.info("aliases: {}".format(bot_command_aliases))
 
@@ -70,6 +71,7 @@ def botalias(bot, event, *args):
                 bot.memory.set_by_path(["bot.command_aliases"], _aliases)
                 bot.memory.save()
 
+                # assignment also rebuilds the precomputed alias lookups in the EventHandler
                 bot._handlers.bot_command = _aliases
 
             botalias(bot, event) # run with no arguments
@@ -1,6 +1,5 @@
 import logging
 import plugins
-import requests
 
 logger = logging.getLogger(__name__)
 
@@ -9,8 +8,8 @@ def _initialise(bot):
 
 def catfact(bot, event, number=1):
     try:
-        r = requests.get("https://catfact.ninja/facts?limit={}".format(number))
-        facts = [fact['fact'] for fact in r.json()['data']]
+        j = yield from bot.http.fetch_json("https://catfact.ninja/facts", params={ "limit": number })
+        facts = [fact['fact'] for fact in j['data']]
         html_text = '<br>'.join(facts)
     except:
         html_text = "Unable to get catfacts right now"
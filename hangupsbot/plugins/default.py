@@ -79,7 +79,7 @@ def broadcast(bot, event, *args):
             """set broadcast message"""
             message = ' '.join(parameters)
             if message:
-                if message.lower().strip().startswith(tuple([_.lower() for _ in bot._handlers.bot_command])):
+                if bot._handlers.starts_with_bot_alias(message):
                     yield from bot.coro_send_message(event.conv, _("broadcast: message not allowed"))
                     return
                 _internal["broadcast"]["message"] = message
@@ -130,9 +130,12 @@ def broadcast(bot, event, *args):
         elif subcmd == "NOW":
             """send the broadcast - no turning back!"""
             context = { "explicit_relay": True } # prevent echos across syncrooms
-            for convid in _internal["broadcast"]["conversations"]:
-                yield from bot.coro_send_message(convid, _internal["broadcast"]["message"], context=context)
-            yield from bot.coro_send_message(event.conv, _("broadcast: message sent to {} chats".format(len(_internal["broadcast"]["conversations"]))))
+            results = yield from bot.coro_send_many(_internal["broadcast"]["conversations"], _internal["broadcast"]["message"], context=context)
+            sent = [ convid for convid, result in results.items() if result is True ]
+            if len(sent) < len(results):
+                yield from bot.coro_send_message(event.conv, _("broadcast: message sent to {} of {} chats".format(len(sent), len(results))))
+            else:
+                yield from bot.coro_send_message(event.conv, _("broadcast: message sent to {} chats".format(len(sent))))
 
         else:
             yield from bot.coro_send_message(event.conv, _("broadcast: /bot broadcast [info|message|add|remove|NOW] ..."))
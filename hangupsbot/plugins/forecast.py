@@ -6,9 +6,8 @@ Instructions:
     * Get an API key from https://darksky.net/dev/
     * Store API key in config.json:forecast_api_key
 """
-import logging
+import aiohttp, asyncio, logging
 import plugins
-import requests
 from decimal import Decimal
 
 logger = logging.getLogger(__name__)
@@ -32,7 +31,7 @@ def setweatherlocation(bot, event, *args):
         yield from bot.coro_send_message(event.conv_id, _('No location was specified, please specify a location.'))
         return
     
-    location = _lookup_address(location)
+    location = yield from _lookup_address(bot, location)
     if location is None:
         yield from bot.coro_send_message(event.conv_id, _('Unable to find the specified location.'))
         return
@@ -49,7 +48,7 @@ def weather(bot, event, *args):
     <b>/bot weather <location></b> Get location's current weather.
     <b>/bot weather</b> Get the hangouts default location's current weather. If the default location is not set talk to a hangout admin.
     """
-    weather = _get_weather(bot, event, args)
+    weather = yield from _get_weather(bot, event, args)
     if weather:
         yield from bot.coro_send_message(event.conv_id, _format_current_weather(weather))
     else:
@@ -60,7 +59,7 @@ def forecast(bot, event, *args):
     <b>/bot weather <location></b> Get location's current forecast.
     <b>/bot weather</b> Get the hangouts default location's forecast. If default location is not set talk to a hangout admin.
     """
-    weather = _get_weather(bot, event, args)
+    weather = yield from _get_weather(bot, event, args)
     if weather:
         yield from bot.coro_send_message(event.conv_id, _format_forecast_weather(weather))
     else:
@@ -98,40 +97,40 @@ def _format_forecast_weather(weather):
         
     return "<br/>".join(weatherStrings)
 
-def _lookup_address(location):
+@asyncio.coroutine
+def _lookup_address(bot, location):
     """
     Retrieve the coordinates of the location from googles geocode api.
     Limit of 2,000 requests a day
     """
     google_map_url = 'https://maps.googleapis.com/maps/api/geocode/json'
     payload = {'address': location}
-    resp = requests.get(google_map_url, params=payload)
     try:
-        resp.raise_for_status()
-        results = resp.json()['results'][0]
+        j = yield from bot.http.fetch_json(google_map_url, params=payload)
+        results = j['results'][0]
         return {
             'lat': results['geometry']['location']['lat'],
             'lng': results['geometry']['location']['lng'],
             'address': results['formatted_address']
         }
     except (IndexError, KeyError):
-        logger.error('unable to parse address return data: %d: %s', resp.status_code, resp.json())
+        logger.error('unable to parse address return data: %s', j)
         return None
-    except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError, requests.exceptions.Timeout):
-        logger.error('unable to connect with maps.googleapis.com: %d - %s', resp.status_code, resp.text)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error('unable to connect with maps.googleapis.com: %s', repr(e))
         return None
 
-def _lookup_weather(coords):
+@asyncio.coroutine
+def _lookup_weather(bot, coords):
     """
     Retrieve the current forecast for the specified coordinates from darksky.net
     Limit of 1,000 requests a day
     """
 
     forecast_io_url = 'https://api.darksky.net/forecast/{0}/{1},{2}?units=auto'.format(_internal['forecast_api_key'],coords['lat'], coords['lng'])
-    r = requests.get(forecast_io_url)
 
     try:
-        j = r.json()
+        j = yield from bot.http.fetch_json(forecast_io_url)
         current = {
             'time' : j['currently']['time'],
             'summary': j['currently']['summary'],
@@ -154,12 +153,13 @@ def _lookup_weather(coords):
     except ValueError as e:
         logger.error("Forecast Error: {}".format(e))
         current = dict()
-    except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError, requests.exceptions.Timeout):
-        logger.error('unable to connect with api.darksky.net: %d - %s', resp.status_code, resp.text)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error('unable to connect with api.darksky.net: %s', repr(e))
         return None
 
     return current
 
+@asyncio.coroutine
 def _get_weather(bot,event,params):
     """ 
     Checks memory for a default location set for the current hangout.
@@ -175,10 +175,10 @@ def _get_weather(bot,event,params):
                 location = bot.memory.get_by_path(["conv_data", event.conv.id_, "default_weather_location"])
     else:
         address = ''.join(parameters).strip()
-        location = _lookup_address(address)
+        location = yield from _lookup_address(bot, address)
     
     if location:
-        return _lookup_weather(location)
+        return (yield from _lookup_weather(bot, location))
     
     return {}
 
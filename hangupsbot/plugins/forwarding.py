@@ -1,4 +1,4 @@
-import aiohttp, asyncio, logging, os, io
+import asyncio, logging, os, io
 
 import hangups
 
@@ -42,7 +42,7 @@ def _handle_forwarding(bot, event, command):
         for link in event.conv_event.attachments:
 
             filename = os.path.basename(link)
-            r = yield from aiohttp.request('get', link)
+            r = yield from bot.http.get(link)
             raw = yield from r.read()
             image_data = io.BytesIO(raw)
             image_id = None
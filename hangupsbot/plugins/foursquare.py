@@ -84,9 +84,9 @@ def foursquare(bot, event,*args):
 
   types = ["food", "drinks", "coffee", "shops", "arts", "outdoors", "sights", "trending", "specials"]
   if args[0] in types:
-    places = getplaces(urllib.parse.quote(" ".join(args[1:])), clid, secret, args[0])
+    places = yield from bot.run_blocking(getplaces, urllib.parse.quote(" ".join(args[1:])), clid, secret, args[0])
   else:
-    places = getplaces(urllib.parse.quote(" ".join(args)), clid, secret)
+    places = yield from bot.run_blocking(getplaces, urllib.parse.quote(" ".join(args)), clid, secret)
   
   if places:
     yield from bot.coro_send_message(event.conv, places)
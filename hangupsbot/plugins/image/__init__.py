@@ -1,12 +1,16 @@
 import aiohttp
 import asyncio
+import hashlib
 import io
 import logging
 import os
 import re
 import sys
+import tempfile
+import time
 
 from asyncio.subprocess import PIPE
+from urllib.parse import urlsplit, urlunsplit
 
 import plugins
 
@@ -15,7 +19,132 @@ logger = logging.getLogger(__name__)
 
 
 _externals = { "bot": None,
-               "ClientSession": aiohttp.ClientSession() }
+               "cache": None,
+               "inflight": {},
+               "downloads": None,
+               "max_size": 20 * 1024 * 1024,
+               "spool_size": 1024 * 1024 }
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class UploadCache:
+    """remember uploaded images in bot memory, so reposting an image needs no download or upload
+    * sha256 of the normalised source url -> content hash, for images fetched by image_upload_single
+      (urls are never stored, they may embed credentials, e.g. telegram bot file links)
+    * content hash -> hangouts image_id, so different urls serving the same bytes share an upload
+    entries expire ttl seconds after they were last used, the least recently used are evicted
+    once there are more than max_size of either"""
+
+    MEMORY_PATH = ["image", "upload_cache"]
+
+    def __init__(self, bot, ttl=604800, max_size=1000):
+        self.bot = bot
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        if bot.memory is not None:
+            bot.memory.ensure_path(self.MEMORY_PATH + ["urls"])
+            bot.memory.ensure_path(self.MEMORY_PATH + ["hashes"])
+            self._urls = bot.memory.get_by_path(self.MEMORY_PATH + ["urls"])
+            self._hashes = bot.memory.get_by_path(self.MEMORY_PATH + ["hashes"])
+        else:
+            self._urls = {}
+            self._hashes = {}
+
+        # entries written before urls were hashed
+        for key in [ key for key in self._urls if not re.match(r"^[0-9a-f]{64}$", key) ]:
+            del self._urls[key]
+
+        self._expire()
+
+    @classmethod
+    def url_key(cls, image_uri):
+        return hashlib.sha256(cls.normalise_url(image_uri).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def normalise_url(image_uri):
+        if image_uri.startswith("//"):
+            image_uri = "https:" + image_uri
+        parts = urlsplit(image_uri)
+        netloc = parts.netloc.lower()
+        if (parts.scheme, parts.port) in (("http", 80), ("https", 443)):
+            netloc = netloc.rsplit(":", 1)[0]
+        return urlunsplit((parts.scheme.lower(), netloc, parts.path or "/", parts.query, ""))
+
+    @staticmethod
+    def content_hash(raw):
+        return hashlib.sha256(raw).hexdigest()
+
+    def _lookup(self, store, key):
+        entry = store.get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if self.ttl and entry["timestamp"] < now - self.ttl:
+            del store[key]
+            return None
+        # last used, for both expiry and eviction
+        entry["timestamp"] = now
+        return entry
+
+    def get_url(self, image_uri):
+        """returns the image_id previously uploaded for this url, or None"""
+        entry = self._lookup(self._urls, self.url_key(image_uri))
+        if entry is not None:
+            image_id = self.get_hash(entry["hash"])
+            if image_id is not None:
+                return image_id
+        self.misses += 1
+        return None
+
+    def get_hash(self, digest):
+        """returns the image_id previously uploaded for this content hash, or None"""
+        entry = self._lookup(self._hashes, digest)
+        if entry is None:
+            return None
+        self.hits += 1
+        return entry["image_id"]
+
+    def remember(self, digest, image_id, image_uri=None):
+        now = time.time()
+        self._hashes[digest] = { "image_id": image_id, "timestamp": now }
+        if image_uri:
+            self._urls[self.url_key(image_uri)] = { "hash": digest, "timestamp": now }
+        self._evict(self._hashes)
+        self._evict(self._urls)
+        self._save()
+
+    def _expire(self):
+        if not self.ttl:
+            return
+        cutoff = time.time() - self.ttl
+        for store in (self._urls, self._hashes):
+            for key in [ key for key, entry in store.items() if entry["timestamp"] < cutoff ]:
+                del store[key]
+
+    def _evict(self, store):
+        if self.max_size and len(store) > self.max_size:
+            oldest = sorted(store, key=lambda key: store[key]["timestamp"])
+            for key in oldest[:len(store) - self.max_size]:
+                del store[key]
+
+    def _save(self):
+        if self.bot.memory is not None:
+            self.bot.memory.save()
+
+    def summary(self):
+        return { "urls": len(self._urls),
+                 "hashes": len(self._hashes),
+                 "hits": self.hits,
+                 "misses": self.misses }
 
 
 try:
@@ -27,6 +156,24 @@ except AttributeError:
 
 def _initialise(bot):
     _externals["bot"] = bot
+
+    # config.json image.download.*: max_size and spool_size (bytes), concurrency (simultaneous downloads)
+    max_size = bot.get_config_option("image.download.max_size")
+    if max_size is not None:
+        _externals["max_size"] = max_size
+    spool_size = bot.get_config_option("image.download.spool_size")
+    if spool_size is not None:
+        _externals["spool_size"] = spool_size
+    _externals["downloads"] = asyncio.Semaphore(bot.get_config_option("image.download.concurrency") or 4)
+
+    # config.json image.cache.ttl (seconds since last use) and image.cache.size, size 0 disables
+    cache_ttl = bot.get_config_option("image.cache.ttl")
+    cache_size = bot.get_config_option("image.cache.size")
+    if cache_size != 0:
+        _externals["cache"] = UploadCache( bot,
+                                           ttl = 604800 if cache_ttl is None else cache_ttl,
+                                           max_size = cache_size or 1000 )
+        plugins.register_shared('image_upload_cache', _externals["cache"])
     plugins.register_shared('image_validate_link', image_validate_link)
     plugins.register_shared('image_upload_single', image_upload_single)
     plugins.register_shared('image_upload_raw', image_upload_raw)
@@ -88,54 +235,148 @@ def image_validate_link(image_uri, reject_googleusercontent=True):
 
 @asyncio.coroutine
 def image_upload_single(image_uri):
+    cache = _externals["cache"]
+    if cache:
+        image_id = cache.get_url(image_uri)
+        if image_id:
+            logger.info("{} already uploaded as {}".format(image_uri, image_id))
+            return image_id
+
+    # concurrent requests for the same image share one download and upload
+    key = UploadCache.normalise_url(image_uri)
+    inflight = _externals["inflight"]
+    future = inflight.get(key)
+    if future is None:
+        future = inflight[key] = asyncio.ensure_future(_image_upload_single(image_uri))
+        future.add_done_callback(lambda done: inflight.pop(key, None))
+
+    return (yield from asyncio.shield(future))
+
+
+@asyncio.coroutine
+def _image_upload_single(image_uri):
     filename = os.path.basename(image_uri)
     logger.info("fetching {}".format(filename))
+
+    image_data = None
     try:
-        r = yield from _externals["ClientSession"].get(image_uri)
-        content_type = r.headers['Content-Type']
+        # bounds the number of response bodies buffered or spooled at any one time
+        with (yield from _externals["downloads"]):
+            image_data, digest = yield from _download(image_uri, filename)
+        if not image_data:
+            return False
 
-        image_handling = False # must == True if valid image, can contain additonal directives
+        image_id, digest = yield from _image_upload_raw(image_data, filename, digest)
 
-        """image handling logic for specific image types - if necessary, guess by extension"""
+    finally:
+        if image_data is not None:
+            image_data.close()
+
+    if image_id and _externals["cache"]:
+        _externals["cache"].remember(digest, image_id, image_uri)
+    return image_id
+
+
+@asyncio.coroutine
+def _download(image_uri, filename):
+    """stream the image into a temporary file, kept in memory until it exceeds spool_size
+    returns (file positioned at 0, sha256 hex digest) or (None, None)"""
+    try:
+        r = yield from _externals["bot"].http.get(image_uri)
+        try:
+            content_type = r.headers['Content-Type']
 
-        if content_type.startswith('image/'): # If it's identifying itself as an image then just upload it - Google's servers will cope.
-            image_handling = "standard"
+            image_handling = False # must == True if valid image, can contain additonal directives
 
-        elif content_type == "application/octet-stream":
-            ext = filename.split(".")[-1].lower() # Try to guess the type from the extension
+            """image handling logic for specific image types - if necessary, guess by extension"""
 
-            if ext in ("jpg", "jpeg", "jpe", "jif", "jfif", "gif", "png", "webp"): # If we know what the extension is, just upload it.
+            if content_type.startswith('image/'): # If it's identifying itself as an image then just upload it - Google's servers will cope.
                 image_handling = "standard"
-            else:
-                image_handling = "image_convert_to_png" # Only send for processing if the content type doesn't show as image and doesn't match known good extensions.
 
-        if image_handling:
-            logger.debug("reading {}".format(image_uri))
-            raw = yield from r.read()
-            logger.debug("finished {}".format(image_uri))
-            if image_handling is not "standard":
-                try:
-                    results = yield from getattr(sys.modules[__name__], image_handling)(raw)
-                    if results:
-                        # allow custom handlers to fail gracefully
-                        raw = results
-                except Exception as e:
-                    logger.exception("custom image handler failed: {}".format(image_handling))
-        else:
-            logger.warning("not image/image-like, filename={}, headers={}".format(filename, r.headers))
-            return False
+            elif content_type == "application/octet-stream":
+                ext = filename.split(".")[-1].lower() # Try to guess the type from the extension
+
+                if ext in ("jpg", "jpeg", "jpe", "jif", "jfif", "gif", "png", "webp"): # If we know what the extension is, just upload it.
+                    image_handling = "standard"
+                else:
+                    image_handling = "image_convert_to_png" # Only send for processing if the content type doesn't show as image and doesn't match known good extensions.
 
-    except (aiohttp_clienterror) as exc:
+            if not image_handling:
+                logger.warning("not image/image-like, filename={}, headers={}".format(filename, r.headers))
+                return None, None
+
+            max_size = _externals["max_size"]
+            if max_size and r.content_length is not None and r.content_length > max_size:
+                raise ImageTooLarge("{} bytes".format(r.content_length))
+
+            logger.debug("reading {}".format(image_uri))
+            image_data = tempfile.SpooledTemporaryFile(max_size=_externals["spool_size"])
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                while True:
+                    chunk = yield from r.content.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size and size > max_size:
+                        # content-length was missing or wrong
+                        raise ImageTooLarge("more than {} bytes".format(max_size))
+                    digest.update(chunk)
+                    image_data.write(chunk)
+            except:
+                image_data.close()
+                raise
+            logger.debug("finished {}, {} bytes".format(image_uri, size))
+
+        finally:
+            r.release()
+
+    except (aiohttp_clienterror, asyncio.TimeoutError) as exc:
         logger.warning("failed to get {} - {}".format(filename, exc))
-        return False
+        return None, None
 
-    image_data = io.BytesIO(raw)
-    image_id = yield from image_upload_raw(image_data, filename=filename)
-    return image_id
+    except ImageTooLarge as exc:
+        logger.warning("not uploading {}, exceeds image.download.max_size: {}".format(filename, exc))
+        return None, None
+
+    image_data.seek(0)
+
+    if image_handling != "standard":
+        try:
+            results = yield from getattr(sys.modules[__name__], image_handling)(image_data.read())
+            if results:
+                # allow custom handlers to fail gracefully
+                image_data.close()
+                return io.BytesIO(results), UploadCache.content_hash(results)
+        except Exception as e:
+            logger.exception("custom image handler failed: {}".format(image_handling))
+        image_data.seek(0)
+
+    return image_data, digest.hexdigest()
 
 
 @asyncio.coroutine
 def image_upload_raw(image_data, filename):
+    image_id, digest = yield from _image_upload_raw(image_data, filename)
+    return image_id
+
+
+@asyncio.coroutine
+def _image_upload_raw(image_data, filename, digest=None):
+    """returns (image_id or False, content hash or None), identical content is only uploaded once
+    on failure the upload is retried from the same file object, rewound"""
+    cache = _externals["cache"]
+    if cache:
+        if digest is None and hasattr(image_data, "seek"):
+            digest = cache.content_hash(image_data.read())
+            image_data.seek(0)
+        if digest is not None:
+            image_id = cache.get_hash(digest)
+            if image_id:
+                logger.info("{} already uploaded as {}".format(filename, image_id))
+                return image_id, digest
+
     image_id = False
     try:
         image_id = yield from _externals["bot"]._client.upload_image(image_data, filename=filename)
@@ -146,7 +387,10 @@ def image_upload_raw(image_data, filename):
             image_id = yield from _externals["bot"]._client.upload_image(image_data, filename=filename)
         except Exception as exc:
             logger.warning("_client.upload_image failed", exc_info=exc)
-    return image_id
+
+    if image_id and cache and digest:
+        cache.remember(digest, image_id)
+    return image_id, digest
 
 
 @asyncio.coroutine
@@ -2,7 +2,7 @@
 based on the word/image list for the image linker bot on reddit
 sauce: http://www.reddit.com/r/image_linker_bot/comments/2znbrg/image_suggestion_thread_20/
 """
-import aiohttp, io, logging, os, random, re
+import io, logging, os, random, re
 
 import plugins
 
@@ -16,7 +16,7 @@ _lookup = {}
 def _initialise(bot):
     _load_all_the_things()
     plugins.register_admin_command(["redditmemeword"])
-    plugins.register_handler(_scan_for_triggers)
+    plugins.register_handler(_scan_for_triggers, independent=True, triggers={"regex": r"\.(?:jpg|png|gif|bmp)\b"})
 
 
 def redditmemeword(bot, event, *args):
@@ -54,7 +54,7 @@ def _scan_for_triggers(bot, event, command):
                     image_link = image_link.replace(".gifv",".gif")
                     image_link = image_link.replace(".webm",".gif")
                 filename = os.path.basename(image_link)
-                r = yield from aiohttp.request('get', image_link)
+                r = yield from bot.http.get(image_link)
                 raw = yield from r.read()
                 image_data = io.BytesIO(raw)
                 logger.debug("uploading: {}".format(filename))
@@ -10,7 +10,8 @@ logger = logging.getLogger(__name__)
 
 
 def _initialise(bot):
-    plugins.register_handler(_watch_image_link, type="message")
+    plugins.register_handler( _watch_image_link, type="message", independent=True,
+                              triggers={ "prefix": [ "https://", "http://", "//" ] } )
 
 
 @asyncio.coroutine
@@ -38,7 +39,7 @@ def _watch_image_link(bot, event, command):
 * FOR FUTURE-PROOFING, INCLUDE [image] PLUGIN IN YOUR CONFIG.JSON
 """
 
-import aiohttp, io, os, re
+import io, os, re
 
 def image_validate_link(image_uri, reject_googleusercontent=True):
     """
@@ -90,7 +91,7 @@ def image_validate_link(image_uri, reject_googleusercontent=True):
 def image_upload_single(image_uri, bot):
     logger.info("getting {}".format(image_uri))
     filename = os.path.basename(image_uri)
-    r = yield from aiohttp.request('get', image_uri)
+    r = yield from bot.http.get(image_uri)
     raw = yield from r.read()
     image_data = io.BytesIO(raw)
     image_id = yield from bot._client.upload_image(image_data, filename=filename)
@@ -1,4 +1,4 @@
-import aiohttp, logging, json, os, random, urllib.request
+import io, logging, json, os, random
 
 import hangups
 
@@ -32,15 +32,13 @@ def meme(bot, event, *args):
         """public api: http://version1.api.memegenerator.net"""
         url_api = 'http://version1.api.memegenerator.net/Instances_Search?q=' + "+".join(parameters) + '&pageIndex=0&pageSize=25'
 
-        api_request = yield from aiohttp.request('get', url_api)
+        api_request = yield from bot.http.get(url_api)
         json_results = yield from api_request.read()
         results = json.loads(str(json_results, 'utf-8'))
 
         if len(results['result']) > 0:
             instanceImageUrl = random.choice(results['result'])['instanceImageUrl']
 
-            req = urllib.request.Request(instanceImageUrl, headers={'User-Agent': 'Mozilla/5.0'})
-            image_data = urllib.request.urlopen(req)
             filename = os.path.basename(instanceImageUrl)
             legacy_segments = [hangups.ChatMessageSegment( instanceImageUrl,
                                                            hangups.SegmentType.LINK,
@@ -51,7 +49,8 @@ def meme(bot, event, *args):
                 photo_id = yield from bot.call_shared('image_upload_single', instanceImageUrl)
             except KeyError:
                 logger.warning('image plugin not loaded - using legacy code')
-                photo_id = yield from bot._client.upload_image(image_data, filename=filename)
+                raw = yield from bot.http.fetch(instanceImageUrl, headers={'User-Agent': 'Mozilla/5.0'})
+                photo_id = yield from bot._client.upload_image(io.BytesIO(raw), filename=filename)
 
             yield from bot.coro_send_message(event.conv.id_, legacy_segments, image_id=photo_id)
 
@@ -27,27 +27,24 @@ def _initialise(bot):
     plugins.register_admin_command(["seturl", "clearurl"])
 
 
-@asyncio.coroutine
-def _open_file(name):
+def _read_and_remove(name):
     logger.debug("opening screenshot file: {}".format(name))
-    return open(name, 'rb')
+    with open(name, 'rb') as file_resource:
+        image_data = io.BytesIO(file_resource.read())
+    os.remove(name)
+    return image_data
 
 
 @asyncio.coroutine
-def _screencap(browser, url, filename):
+def _screencap(bot, browser, url, filename):
     logger.info("screencapping {} and saving as {}".format(url, filename))
-    browser.set_window_size(1280, 800)
-    browser.get(url)
+    yield from bot.run_blocking(browser.set_window_size, 1280, 800)
+    yield from bot.run_blocking(browser.get, url)
     yield from asyncio.sleep(5)
-    loop = asyncio.get_event_loop()
-    yield from loop.run_in_executor(None, browser.save_screenshot, filename)
+    yield from bot.run_blocking(browser.save_screenshot, filename)
 
     # read the resulting file into a byte array
-    file_resource = yield from _open_file(filename)
-    file_data = yield from loop.run_in_executor(None, file_resource.read)
-    file_resource.close()
-    image_data = yield from loop.run_in_executor(None, io.BytesIO, file_data)
-    yield from loop.run_in_executor(None, os.remove, filename)
+    image_data = yield from bot.run_blocking(_read_and_remove, filename)
 
     return image_data
 
@@ -108,15 +105,14 @@ def screenshot(bot, event, *args):
         logger.debug("temporary screenshot file: {}".format(filepath))
 
         try:
-            browser = webdriver.PhantomJS(desired_capabilities=dcap,service_log_path=os.path.devnull)
+            browser = yield from bot.run_blocking(webdriver.PhantomJS, desired_capabilities=dcap, service_log_path=os.path.devnull)
         except selenium.common.exceptions.WebDriverException as e:
             yield from bot.coro_send_message(event.conv, "<i>phantomjs could not be started - is it installed?</i>".format(e))
             _externals["running"] = False
             return
 
         try:
-            loop = asyncio.get_event_loop()
-            image_data = yield from _screencap(browser, url, filepath)
+            image_data = yield from _screencap(bot, browser, url, filepath)
         except Exception as e:
             yield from bot.coro_send_message(event.conv_id, "<i>error getting screenshot</i>")
             logger.exception("screencap failed".format(url))
@@ -2,7 +2,6 @@ import logging
 import hangups
 
 from utils import unicode_to_ascii
-import urllib.request
 
 import plugins
 
@@ -38,7 +37,7 @@ def lookup(bot, event, *args):
 
     logger.debug("{0} ({1}) has requested to lookup '{2}'".format(event.user.full_name, event.user.id_.chat_id, keyword))
 
-    html = urllib.request.urlopen(spreadsheet_url).read()
+    html = yield from bot.http.fetch(spreadsheet_url)
 
     keyword_raw = keyword.strip().lower()
     keyword_ascii = unicode_to_ascii(keyword_raw)
@@ -50,7 +49,7 @@ def lookup(bot, event, *args):
     # Adapted from http://stackoverflow.com/questions/23377533/python-beautifulsoup-parsing-table
     from bs4 import BeautifulSoup
 
-    soup = BeautifulSoup(str(html, 'utf-8'), 'html.parser')
+    soup = yield from bot.run_blocking(BeautifulSoup, str(html, 'utf-8'), 'html.parser', pool="cpu")
     table = soup.find('table', attrs={'class':table_class})
     table_body = table.find('tbody')
 
@@ -15,7 +15,7 @@ nicks = {}
 
 def _initialise(bot):
     _migrate_mention_config_to_memory(bot)
-    plugins.register_handler(_handle_mention, "message")
+    plugins.register_handler(_handle_mention, "message", triggers={"contains": "@"})
     plugins.register_user_command(["pushbulletapi", "setnickname", "bemorespecific"])
     plugins.register_admin_command(["mention"])
 
@@ -7,9 +7,8 @@ ICAO Airport Codes: https://en.wikipedia.org/wiki/International_Civil_Aviation_O
 METAR source: http://aviationweather.gov
 """
 
-import logging
+import aiohttp, asyncio, logging
 import plugins
-import requests
 from xml.etree import ElementTree
 
 logger = logging.getLogger(__name__)
@@ -17,12 +16,16 @@ logger = logging.getLogger(__name__)
 def _initialize(bot):
     plugins.register_user_command(['metar','taf'])
 
-def _api_lookup(type, iaco):
+@asyncio.coroutine
+def _api_lookup(bot, type, iaco):
     api_url = "http://aviationweather.gov/adds/dataserver_current/httpparam?dataSource={0}s&requestType=retrieve&format=xml&hoursBeforeNow=3&mostRecent=true&stationString={1}".format(type, iaco)
-    r= requests.get(api_url)
     try:
-        root = ElementTree.fromstring(r.content)
+        content = yield from bot.http.fetch(api_url)
+        root = ElementTree.fromstring(content)
         raw = root.findall('data/{}/raw_text'.format(type))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.info("METAR Error: {}".format(repr(e)))
+        return None
     except ElementTree.ParseError as e:
         logger.info("METAR Error: {}".format(e))
         return None
@@ -38,7 +41,7 @@ METAR source: http://aviationweather.gov"""
         yield from bot.coro_send_message(event.conv_id, "You need to enter the ICAO airport code you wish the look up, https://en.wikipedia.org/wiki/International_Civil_Aviation_Organization_airport_code .")
         return
 
-    data = _api_lookup('METAR',code)
+    data = yield from _api_lookup(bot, 'METAR', code)
 
     if data is None:
         yield from bot.coro_send_message(event.conv_id, "There was an error retrieving the METAR information.")
@@ -58,7 +61,7 @@ TAF source: http://aviationweather.gov"""
         yield from bot.coro_send_message(event.conv_id, "You need to enter the ICAO airport code you wish the look up, https://en.wikipedia.org/wiki/International_Civil_Aviation_Organization_airport_code .")
         return
 
-    data = _api_lookup('TAF',code)
+    data = yield from _api_lookup(bot, 'TAF', code)
 
     if data is None:
         yield from bot.coro_send_message(event.conv_id, "There was an error retrieving the TAF information.")
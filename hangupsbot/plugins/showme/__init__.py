@@ -33,7 +33,7 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 __author__ = "Daniel Casner <www.artificelab.com>"
 
 import time
-import aiohttp, asyncio, io, logging
+import asyncio, io, logging
 import plugins
 
 logger = logging.getLogger(__name__)
@@ -46,7 +46,7 @@ def _initalize(bot):
 
 def sendSource(bot, event, name, imgLink):
     logger.info("Getting {}".format(imgLink))
-    r = yield from aiohttp.request("get", imgLink)
+    r = yield from bot.http.get(imgLink)
     raw = yield from r.read()
     contentType = r.headers['Content-Type']
     logger.info("\tContent-type: {}".format(contentType))
@@ -89,7 +89,8 @@ class SlackAsyncListener(AsyncRequestHandler):
                 
             if "user_name" in payload:
                 if "slackbot" not in str(payload["user_name"][0]):
-                    text = self._remap_internal_slack_ids(text)
+                    # label lookups call the slack api with urlopen
+                    text = yield from self._bot.run_blocking(self._remap_internal_slack_ids, text)
 
                     user = payload["user_name"][0] + "@slack"
                     original_message = unescape(text)
@@ -174,7 +175,6 @@ class SlackAsyncListener(AsyncRequestHandler):
 
 @asyncio.coroutine
 def _broadcast(bot, broadcast_list, context):
-    target_conv_id = broadcast_list[0][0]
     message = broadcast_list[0][1]
     image_id = broadcast_list[0][2]
 
@@ -182,9 +182,12 @@ def _broadcast(bot, broadcast_list, context):
     if not isinstance(slackChannelConfigs, list):
         return
 
+    # coro_send_many() may target several conversations at once
+    target_conv_ids = [ response[0] for response in broadcast_list ]
+
     channelConfigs = []
     for channelConfig in slackChannelConfigs:
-        if target_conv_id in channelConfig["synced_conversations"]:
+        if any(target_conv_id in channelConfig["synced_conversations"] for target_conv_id in target_conv_ids):
             channelConfigs.append(channelConfig)
     if not channelConfigs:
         return
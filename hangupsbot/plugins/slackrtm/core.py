@@ -1,6 +1,7 @@
 import asyncio
 import json
 import html
+import io
 import logging
 import mimetypes
 import os
@@ -8,7 +9,6 @@ import pprint
 import re
 import threading
 import time
-import urllib.request
 import hangups
 import emoji
 
@@ -528,10 +528,10 @@ class SlackRTM(object):
         token = self.apikey
         logger.info('downloading %s', image_uri)
         filename = os.path.basename(image_uri)
-        request = urllib.request.Request(image_uri)
-        request.add_header("Authorization", "Bearer %s" % token)
-        image_response = urllib.request.urlopen(request)
-        content_type = image_response.info().get_content_type()
+        image_response = yield from self.bot.http.get(image_uri, headers={ "Authorization": "Bearer %s" % token })
+        image_response.raise_for_status()
+        image_data = io.BytesIO((yield from image_response.read()))
+        content_type = image_response.content_type
 
         filename_extension = mimetypes.guess_extension(content_type).lower() # returns with "."
         physical_extension = "." + filename.rsplit(".", 1).pop().lower()
@@ -546,7 +546,7 @@ class SlackRTM(object):
             filename += filename_extension
 
         logger.info('uploading as %s', filename)
-        image_id = yield from self.bot._client.upload_image(image_response, filename=filename)
+        image_id = yield from self.bot._client.upload_image(image_data, filename=filename)
 
         logger.info('sending HO message, image_id: %s', image_id)
         yield from sync._bridgeinstance._send_to_internal_chat(
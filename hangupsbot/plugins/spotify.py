@@ -87,7 +87,10 @@ def _initialise(bot):
         bot.config.set_by_path(config_path, real_path)
         bot.config.save()
 
-    plugins.register_handler(_watch_for_music_link, "message")
+    plugins.register_handler(
+        _watch_for_music_link, "message", independent=True,
+        triggers={"contains": ["youtube.com/", "youtu.be/", "soundcloud.com/",
+                               "spotify.com/track/"]})
     plugins.register_user_command(["spotify"])
 
 @asyncio.coroutine
@@ -102,11 +105,9 @@ def _watch_for_music_link(bot, event):
     enabled = bot.conversation_memory_get(event.conv_id, "spotify_enabled")
 
     # pylint:disable=protected-access
-    prefixes = bot._handlers.bot_command
-    # pylint:enable=protected-access
-    prefixes = tuple(prefixes) if isinstance(prefixes, list) else prefixes
-    if not enabled or event.text.startswith(prefixes):
+    if not enabled or bot._handlers.starts_with_bot_alias(event.text):
         return
+    # pylint:enable=protected-access
 
     links = extract_music_links(event.text)
     if not links:
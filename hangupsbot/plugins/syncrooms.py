@@ -63,19 +63,21 @@ def _migrate_syncroom_v1(bot):
 
 @asyncio.coroutine
 def _broadcast(bot, broadcast_list, context):
-    target_conv_id = broadcast_list[0][0]
     message = broadcast_list[0][1]
     image_id = broadcast_list[0][2]
 
     if not bot.get_config_option('syncing_enabled'):
         return
 
+    # coro_send_many() may target several conversations at once
+    target_conv_ids = [ response[0] for response in broadcast_list ]
+
     syncouts = bot.get_config_option('sync_rooms') or []
     syncout = False
     for sync_room_list in syncouts:
-        if target_conv_id in sync_room_list:
-            syncout = sync_room_list
-            break
+        if any(target_conv_id in sync_room_list for target_conv_id in target_conv_ids):
+            syncout = syncout or []
+            syncout.extend([ relay_id for relay_id in sync_room_list if relay_id not in syncout ])
     if not syncout:
         return
 
@@ -109,14 +111,14 @@ def _broadcast(bot, broadcast_list, context):
                 message = "{}: {}".format(full_name, message)
 
     # for messages from other plugins, relay them
-    for relay_id in syncout:
-        if target_conv_id != relay_id:
-            logger.info("BROADCASTING: {} - {}".format(message, passthru))
-            yield from bot.coro_send_message(
-                relay_id,
-                message,
-                image_id = image_id,
-                context = { "passthru": passthru })
+    relay_ids = [ relay_id for relay_id in syncout if relay_id not in target_conv_ids ]
+    if relay_ids:
+        logger.info("BROADCASTING: {} - {}".format(message, passthru))
+        yield from bot.coro_send_many(
+            relay_ids,
+            message,
+            image_id = image_id,
+            context = { "passthru": passthru })
 
 
 @asyncio.coroutine
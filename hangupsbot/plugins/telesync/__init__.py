@@ -30,12 +30,10 @@ logger = logging.getLogger(__name__)
 reg_code_prefix = "VERIFY"
 
 
-client_session = None
-
 @asyncio.coroutine
 def convert_online_mp4_to_gif(source_url, fallback_url=False):
     """experimental utility function to convert telegram mp4s back into gifs"""
-    global client_session
+    http = tg_bot.ho_bot.http
 
     config = _telesync_config(tg_bot.ho_bot)
 
@@ -52,7 +50,7 @@ def convert_online_mp4_to_gif(source_url, fallback_url=False):
         api_key = "gifs56d63999f0f34"
 
     # retrieve the source image
-    api_request = yield from client_session.get(source_url)
+    api_request = yield from http.get(source_url)
     raw_image = yield from api_request.read()
 
     # upload it to gifs.com for conversion
@@ -64,7 +62,7 @@ def convert_online_mp4_to_gif(source_url, fallback_url=False):
     data.add_field('file', raw_image)
     data.add_field('title', 'example.mp4')
 
-    response = yield from client_session.post(url, data=data, headers=headers)
+    response = yield from http.post(url, data=data, headers=headers)
     if response.status != 200:
         return fallback_url or source_url
 
@@ -1095,12 +1093,9 @@ def _initialise(bot):
         bot.memory.set_by_path(['profilesync'], {'ho2tg': {}, 'tg2ho': {}})
         bot.memory.save()
 
-    global client_session
     global tg_bot
     global tg_loop
 
-    client_session = aiohttp.ClientSession()
-
     tg_bot = TelegramBot(bot)
 
     tg_bot.set_on_message_callback(tg_on_message)
@@ -1132,11 +1127,8 @@ def _initialise(bot):
 
 @asyncio.coroutine
 def _finalise(bot):
-    global client_session
     global tg_bot
     global tg_loop
-    if client_session:
-        yield from client_session.close()
     if tg_bot:
         tg_bot.chatbridge.close()
     if tg_loop:
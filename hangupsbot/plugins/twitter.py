@@ -1,4 +1,4 @@
-import aiohttp, asyncio, io, logging, os, re, urllib.request, json, datetime
+import aiohttp, asyncio, io, logging, os, re, json, datetime
 from TwitterAPI import TwitterAPI
 from bs4 import BeautifulSoup
 import plugins
@@ -27,7 +27,7 @@ def prettydate(diff):
 
 def _initialise(bot):
   plugins.register_admin_command(["twitterkey", "twittersecret", 'twitterconfig'])
-  plugins.register_handler(_watch_twitter_link, type="message")
+  plugins.register_handler(_watch_twitter_link, type="message", independent=True, triggers={"contains": "twitter.com/"})
 
 def twittersecret(bot, event, secret):
   '''Set your Twitter API Secret. Get one from https://apps.twitter.com/app'''
@@ -72,8 +72,9 @@ def _watch_twitter_link(bot, event, command):
     key = bot.memory.get_by_path(['twitter', 'key'])
     secret = bot.memory.get_by_path(['twitter', 'secret'])
     tweet_id = re.match(r".+/(\d+)", event.text).group(1)
-    api = TwitterAPI(key, secret, auth_type="oAuth2")
-    tweet = json.loads(api.request('statuses/show/:{}'.format(tweet_id)).text)
+    api = yield from bot.run_blocking(TwitterAPI, key, secret, auth_type="oAuth2")
+    response = yield from bot.run_blocking(api.request, 'statuses/show/:{}'.format(tweet_id))
+    tweet = json.loads(response.text)
     text = re.sub(r'(\W)@(\w{1,15})(\W)', r'\1<a href="https://twitter.com/\2">@\2</a>\3' ,tweet['text'])
     text = re.sub(r'(\W)#(\w{1,15})(\W)', r'\1<a href="https://twitter.com/hashtag/\2">#\2</a>\3', text)
     time = tweet['created_at']
@@ -89,7 +90,7 @@ def _watch_twitter_link(bot, event, command):
         if image['type'] == 'photo':
           imagelink = image['media_url']
           filename = os.path.basename(imagelink)
-          r = yield from aiohttp.request('get',imagelink)
+          r = yield from bot.http.get(imagelink)
           raw = yield from r.read()
           image_data = io.BytesIO(raw)
           image_id = yield from bot._client.upload_image(image_data, filename=filename)
@@ -102,15 +103,14 @@ def _watch_twitter_link(bot, event, command):
   except:
     url = event.text.lower()
     try:
-      response = urllib.request.urlopen(url)
-    except URLError as e:
+      body = yield from bot.http.fetch(url)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
       logger.info("Tried and failed to get the twitter status text:(")
-      logger.info(e.read())
+      logger.info(e)
       return
 
     username = re.match(r".+twitter\.com/([a-zA-Z0-9_]+)/", url).group(1)
-    body = response.read()
-    soup = BeautifulSoup(body.decode("utf-8"), "lxml")
+    soup = yield from bot.run_blocking(BeautifulSoup, body.decode("utf-8"), "lxml", pool="cpu")
     twhandle = soup.title.text.split(" on Twitter: ")[0].strip()
     tweet = re.sub(r"#([a-zA-Z0-9]*)",r"<a href='https://twitter.com/hashtag/\1'>#\1</a>", soup.title.text.split(" on Twitter: ")[1].strip())
     message = "<b><a href='{}'>@{}</a> [{}]</b>: {}".format("https://twitter.com/{}".format(username), username, twhandle, tweet)
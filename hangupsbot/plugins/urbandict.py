@@ -5,7 +5,6 @@
 
 import sys
 
-from urllib.request import urlopen
 from urllib.parse import quote as urlquote
 from html.parser import HTMLParser
 
@@ -75,12 +74,11 @@ def urbandict(bot, event, *args):
         url = "http://www.urbandictionary.com/define.php?term=%s" % \
               urlquote(term)
 
-    f = urlopen(url)
-    data = f.read().decode('utf-8')
+    data = yield from bot.http.fetch_text(url, encoding='utf-8')
 
     urbanDictParser = UrbanDictParser()
     try:
-        urbanDictParser.feed(data)
+        yield from bot.run_blocking(urbanDictParser.feed, data, pool="cpu")
     except IndexError:
         # apparently, nothing was returned
         pass
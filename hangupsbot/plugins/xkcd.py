@@ -3,7 +3,6 @@
 import plugins
 from hangups import ChatMessageSegment
 
-import aiohttp
 import asyncio
 import io
 import json
@@ -15,7 +14,7 @@ _cache = {}
 
 def _initialise():
     plugins.register_user_command(["xkcd"])
-    plugins.register_handler(_watch_xkcd_link, type="message")
+    plugins.register_handler(_watch_xkcd_link, type="message", independent=True, triggers={"contains": "xkcd"})
 
 regexps = (
     "https?://(?:www\.)?(?:explain)?xkcd.com/([0-9]+)(?:/|\s|$)",
@@ -73,7 +72,7 @@ def _get_comic(bot, num=None):
     if num in _cache:
         return _cache[num]
     else:
-        request = yield from aiohttp.request('get', url)
+        request = yield from bot.http.get(url)
         raw = yield from request.read()
         info = json.loads(raw.decode())
         
@@ -81,11 +80,17 @@ def _get_comic(bot, num=None):
             # may happen when searching for the latest comic
             return _cache[info['num']]
         
-        filename = os.path.basename(info["img"])
-        request = yield from aiohttp.request('get', info["img"])
-        raw = yield from request.read()
-        image_data = io.BytesIO(raw)
-        info['image_id'] = yield from bot._client.upload_image(image_data, filename=filename)
+        try:
+            # shares the image plugin's upload cache, comics survive restarts without re-uploading
+            info['image_id'] = yield from bot.call_shared('image_upload_single', info["img"])
+        except KeyError:
+            filename = os.path.basename(info["img"])
+            request = yield from bot.http.get(info["img"])
+            raw = yield from request.read()
+            image_data = io.BytesIO(raw)
+            info['image_id'] = yield from bot._client.upload_image(image_data, filename=filename)
+        if not info['image_id']:
+            raise RuntimeError("failed to upload {}".format(info["img"]))
         _cache[info['num']] = info
         return info
 
@@ -113,7 +118,7 @@ def _print_comic(bot, event, num=None):
 
 @asyncio.coroutine
 def _search_comic(bot, event, terms):
-    request = yield from aiohttp.request('get', "https://relevantxkcd.appspot.com/process?%s" % urllib.parse.urlencode({
+    request = yield from bot.http.get("https://relevantxkcd.appspot.com/process?%s" % urllib.parse.urlencode({
         "action": "xkcd",
         "query": " ".join(terms),
     }))
@@ -0,0 +1,123 @@
+"""in-process sampling profiler, toggled at runtime via /bot profile
+a SIGPROF interval timer interrupts the main thread (where the asyncio event loop runs) and
+the stacks of all busy threads are counted - nothing is traced between samples, so overhead
+is bounded by the sampling interval. output is in collapsed-stack format, as consumed by
+flamegraph.pl and speedscope
+* the timer counts cpu time of the whole process, including the executor pools, but there is
+  no per-thread cpu time: every thread that is not idle when the timer fires gets the sample,
+  and a thread blocked inside a c call (e.g. a socket read) looks busy
+* stacks are prefixed with "main" or "worker" so pool work is not charged to the event loop
+"""
+import logging, signal, sys, threading, time
+
+from collections import Counter
+
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """collect collapsed stacks and per-plugin sample counts from periodic signals"""
+
+    MAX_DEPTH = 64
+
+    # innermost frames of a thread that is waiting for work, not using cpu
+    IDLE_FRAMES = { ("concurrent.futures.thread", "_worker"),
+                    ("selectors", "select"),
+                    ("threading", "wait") }
+
+    def __init__(self):
+        self.interval = 0.005
+        self.stacks = Counter()
+        self.modules = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+
+        self._previous_handler = None
+
+    @property
+    def supported(self):
+        return hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+    @property
+    def running(self):
+        return self.started is not None
+
+    def start(self, interval=None):
+        """begin sampling every interval seconds (of cpu time), must be called from the main thread"""
+        if not self.supported:
+            raise RuntimeError("sampling profiler requires signal.setitimer (unix only)")
+        if self.running:
+            raise RuntimeError("profiler already running")
+
+        if interval:
+            self.interval = interval
+
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.started = time.monotonic()
+
+        logger.info("profiler started, interval {}s".format(self.interval))
+
+    def stop(self):
+        if not self.running:
+            raise RuntimeError("profiler not running")
+
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self._previous_handler = None
+
+        self.elapsed += time.monotonic() - self.started
+        self.started = None
+
+        logger.info("profiler stopped, {} samples".format(self.samples))
+
+    def reset(self):
+        self.stacks = Counter()
+        self.modules = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        if self.running:
+            self.started = time.monotonic()
+
+    def _sample(self, signum, frame):
+        main = threading.main_thread().ident
+        for ident, thread_frame in sys._current_frames().items():
+            if ident == main:
+                # the handler's own frame is not part of the sampled stack
+                thread_frame = frame
+            self._sample_thread("main" if ident == main else "worker", thread_frame)
+
+    def _sample_thread(self, thread, frame):
+        if frame is None or (frame.f_globals.get("__name__"), frame.f_code.co_name) in self.IDLE_FRAMES:
+            return
+
+        frames = []
+        plugin = None
+        while frame is not None and len(frames) < self.MAX_DEPTH:
+            module = frame.f_globals.get("__name__", "?")
+            if plugin is None and module.startswith(("plugins.", "commands.")):
+                # innermost plugin frame owns the sample
+                plugin = module
+            frames.append("{}:{}".format(module, frame.f_code.co_name))
+            frame = frame.f_back
+
+        frames.append(thread)
+        frames.reverse()
+        self.stacks[";".join(frames)] += 1
+        self.modules[plugin or "core"] += 1
+        self.samples += 1
+
+    def top_modules(self, limit=10):
+        return self.modules.most_common(limit)
+
+    def dump(self, path):
+        """write collapsed stacks ("frame;frame;frame count" per line), returns number of lines"""
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write("{} {}\n".format(stack, count))
+        return len(self.stacks)
+
+
+sampler = StackSampler()
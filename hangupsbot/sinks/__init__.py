@@ -1,9 +1,11 @@
-import asyncio, functools, logging, os, ssl
+import asyncio, functools, json, logging, os, ssl
 
 from aiohttp import web
 from threading import Thread
+from urllib.parse import parse_qs
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from utils import class_from_name
+from metrics import summary_as_dicts
 
 from sinks.base_bot_request_handler import BaseBotRequestHandler, AsyncRequestHandler
 
@@ -87,6 +89,24 @@ def start(bot):
 
                 threadcount = threadcount + 1
 
+    # config.json metrics.http: { "name": "127.0.0.1", "port": 9002, "certfile": null }
+    #   handler/command latency as json on GET /_metrics, served by its own listener only as
+    #   the endpoint has no authentication - keep it bound to a private address
+    metrics_sink = bot.get_config_option('metrics.http')
+    if isinstance(metrics_sink, dict) and metrics_sink.get("port"):
+        aiohttp_start(
+            bot,
+            metrics_sink.get("name", "127.0.0.1"),
+            metrics_sink["port"],
+            metrics_sink.get("certfile"),
+            MetricsRequestHandler,
+            "metrics")
+
+        aiohttpcount = aiohttpcount + 1
+
+    elif metrics_sink:
+        logger.error("config.metrics.http must be a dict with at least a port, metrics listener not started")
+
     if threadcount:
         logger.info("{} threaded listener(s)".format(threadcount))
 
@@ -164,6 +184,35 @@ def aiohttp_start(bot, name, port, certfile, RequestHandlerClass, group, callbac
 
     tracking.register_aiohttp_web(group)
 
+class MetricsRequestHandler(AsyncRequestHandler):
+    """dedicated listener for GET /_metrics, see metrics.http in start()"""
+
+    def addroutes(self, router):
+        router.add_route("GET", "/_metrics", aiohttp_metrics_handler(self.bot))
+
+def aiohttp_metrics_handler(bot):
+    @asyncio.coroutine
+    def metrics(request):
+        from commands import command # XXX: needs to be late-imported
+
+        limit = parse_qs(request.query_string).get("limit", [None])[0]
+        limit = int(limit) if limit and limit.isdigit() else None
+
+        results = { "handlers": summary_as_dicts( bot._handlers.stats,
+                                                  fields=("type", "module.path", "function"),
+                                                  limit=limit ),
+                    "commands": summary_as_dicts( command.stats,
+                                                  fields=("command",),
+                                                  limit=limit ),
+                    "executors": summary_as_dicts( bot._executors.stats,
+                                                   fields=("pool", "stage") ),
+                    "counters": command.stats.counters }
+
+        return web.Response( body=json.dumps(results).encode("utf-8"),
+                             content_type="application/json" )
+
+    return metrics
+
 def aiohttp_started(future, handler, app, group, callback=None):
     server = future.result()
     constructors = (server, handler, app, group)
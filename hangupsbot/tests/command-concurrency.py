@@ -0,0 +1,121 @@
+"""nested command dispatch under the in-flight command limits
+
+runs /bot echo (which dispatches convecho through command.run) with one slot per user and
+one slot globally, under the "queue" and the "reject" policy - the nested convecho must
+share the slot held by echo instead of waiting for it or being rejected
+
+usage: command-concurrency.py [-h] [-t TIMEOUT]
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -t TIMEOUT, --timeout TIMEOUT
+                        seconds before a policy run is considered deadlocked
+
+example usage (from the hangupsbot directory):
+python3 tests/command-concurrency.py
+"""
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-t', '--timeout', type=float, default=5, help="seconds before a policy run is considered deadlocked")
+
+args = parser.parse_args()
+
+import asyncio, gettext, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+gettext.install('hangupsbot')
+
+import handlers # same import order as hangupsbot.py, avoids the circular import via commands
+
+from commands import command
+from commands.convid import convecho
+from plugins.default import echo
+
+
+class StubConversations:
+    def __init__(self, conv_ids):
+        self.catalog = { conv_id: {} for conv_id in conv_ids }
+
+    def get(self, filter=None):
+        conv_id = filter[3:] if filter.startswith("id:") else filter
+        return { conv_id: self.catalog[conv_id] } if conv_id in self.catalog else {}
+
+
+class StubHandlers:
+    def starts_with_bot_alias(self, text):
+        return False
+
+
+class StubBot:
+    def __init__(self, config):
+        self.config = config
+        self.conversations = StubConversations(["CONV1"])
+        self._handlers = StubHandlers()
+        self.sent = []
+
+    def get_config_option(self, option):
+        return self.config.get(option)
+
+    def get_config_suboption(self, conv_id, option):
+        return []
+
+    @asyncio.coroutine
+    def coro_send_message(self, conversation, message, context=None):
+        yield from asyncio.sleep(0)
+        self.sent.append(message)
+
+    @asyncio.coroutine
+    def coro_send_many(self, conversation_ids, message, **kwargs):
+        yield from asyncio.sleep(0)
+        self.sent.append(message)
+
+
+class StubUserID:
+    chat_id = "USER1"
+
+
+class StubEvent:
+    def __init__(self, text):
+        self.text = text
+        self.conv_id = "CONV1"
+        self.conv = "CONV1"
+        self.user_id = StubUserID()
+
+
+command.commands["echo"] = asyncio.coroutine(echo)
+command.commands["convecho"] = asyncio.coroutine(convecho)
+
+failed = []
+loop = asyncio.get_event_loop()
+
+for policy in [ "queue", "reject" ]:
+    bot = StubBot({ "commands.concurrency.global": 1,
+                    "commands.concurrency.user": 1,
+                    "commands.concurrency.policy": policy })
+    command.set_bot(bot)
+
+    try:
+        loop.run_until_complete(asyncio.wait_for(
+            command.run(bot, StubEvent("/bot echo hello"), "echo", "hello", raise_exceptions=True),
+            args.timeout ))
+    except asyncio.TimeoutError:
+        failed.append("{}: deadlocked".format(policy))
+        continue
+    except RuntimeError as e:
+        failed.append("{}: {}".format(policy, e))
+        continue
+
+    if bot.sent != [ "hello" ]:
+        failed.append("{}: sent {}".format(policy, bot.sent))
+    elif command._limiter_users or command._limiter_global.locked():
+        failed.append("{}: slots not released".format(policy))
+    else:
+        print("{}: OK".format(policy))
+
+if failed:
+    print("FAILED: {}".format(", ".join(failed)))
+    sys.exit(1)
+
+print("OK: nested commands share the slot of their caller")
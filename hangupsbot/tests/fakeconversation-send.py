@@ -0,0 +1,104 @@
+"""ordering and throughput test for FakeConversation.send_message
+
+sends messages concurrently to several conversations through a stub client whose
+send_chat_message() has random latency, then checks every conversation received its
+messages in the order they were sent and reports throughput
+
+usage: fakeconversation-send.py [-h] [-c CONVERSATIONS] [-m MESSAGES] [-l LATENCY]
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -c CONVERSATIONS, --conversations CONVERSATIONS
+                        number of conversations to send to
+  -m MESSAGES, --messages MESSAGES
+                        messages per conversation
+  -l LATENCY, --latency LATENCY
+                        maximum simulated send latency in seconds
+
+example usage (from the hangupsbot directory):
+python3 tests/fakeconversation-send.py -c 10 -m 50 -l 0.01
+"""
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-c', '--conversations', type=int, default=10, help="number of conversations to send to")
+parser.add_argument('-m', '--messages', type=int, default=50, help="messages per conversation")
+parser.add_argument('-l', '--latency', type=float, default=0.01, help="maximum simulated send latency in seconds")
+
+args = parser.parse_args()
+
+import asyncio, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from hangups_conversation import FakeConversation
+
+
+class StubClient:
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = {}
+        self._client_generated_id = 0
+
+    def get_request_header(self):
+        return None
+
+    def get_client_generated_id(self):
+        self._client_generated_id += 1
+        return self._client_generated_id
+
+    @asyncio.coroutine
+    def send_chat_message(self, request):
+        # simulated network latency, long enough to reorder unserialised sends
+        yield from asyncio.sleep(random.uniform(0, self.latency))
+        conv_id = request.event_request_header.conversation_id.id
+        text = "".join(segment.text for segment in request.message_content.segment)
+        self.received.setdefault(conv_id, []).append(text)
+
+
+class StubHandlers:
+    def register_passthru(self, variable):
+        return "passthru"
+
+    def register_context(self, context):
+        return "context"
+
+
+class StubBot:
+    def __init__(self, client):
+        self._client = client
+        self._handlers = StubHandlers()
+
+
+@asyncio.coroutine
+def send_all(bot, conversations, messages):
+    sends = []
+    for index in range(messages):
+        for conv_id in conversations:
+            _fc = FakeConversation(bot, conv_id)
+            sends.append(_fc.send_message( str(index),
+                                           context = { "passthru": {}, "history": True } ))
+    yield from asyncio.gather(*sends)
+
+
+client = StubClient(args.latency)
+bot = StubBot(client)
+conversations = [ "CONV{}".format(number) for number in range(args.conversations) ]
+
+start = time.monotonic()
+asyncio.get_event_loop().run_until_complete(send_all(bot, conversations, args.messages))
+elapsed = time.monotonic() - start
+
+expected = [ str(index) for index in range(args.messages) ]
+out_of_order = [ conv_id for conv_id in conversations if client.received.get(conv_id) != expected ]
+
+total = args.conversations * args.messages
+print("{} messages to {} conversations in {:.3f}s, {:.1f} messages/s".format(
+    total, args.conversations, elapsed, total / elapsed))
+
+if out_of_order:
+    print("FAILED: {} conversation(s) received messages out of order: {}".format(
+        len(out_of_order), ", ".join(out_of_order)))
+    sys.exit(1)
+
+print("OK: every conversation received its messages in order")
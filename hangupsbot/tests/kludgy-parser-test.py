@@ -0,0 +1,122 @@
+"""differential fuzz test and benchmark for parsers.kludgy_html_parser
+
+1. random markup built from fragments is parsed by both tokenize_to_segments() and the
+   HTMLParser-based simpleHTMLParser, every message the tokenizer accepts must produce
+   identical segments
+2. MESSAGES messages from the corpus (default: bridged-messages.txt, repeated as needed)
+   are parsed with both implementations and timed
+
+usage: kludgy-parser-test.py [-h] [-f FUZZ] [-m MESSAGES] [-s SEED] [corpus]
+
+positional arguments:
+  corpus                file with one html message per line
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -f FUZZ, --fuzz FUZZ  number of random messages to compare
+  -m MESSAGES, --messages MESSAGES
+                        number of corpus messages to benchmark
+  -s SEED, --seed SEED  random seed for the fuzz test
+
+example usage (from the hangupsbot directory):
+python3 tests/kludgy-parser-test.py -f 100000 -m 10000
+"""
+import argparse, os
+
+parser = argparse.ArgumentParser()
+parser.add_argument("corpus", nargs="?", help="file with one html message per line",
+                    default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bridged-messages.txt"))
+parser.add_argument('-f', '--fuzz', type=int, default=100000, help="number of random messages to compare")
+parser.add_argument('-m', '--messages', type=int, default=10000, help="number of corpus messages to benchmark")
+parser.add_argument('-s', '--seed', type=int, default=None, help="random seed for the fuzz test")
+
+args = parser.parse_args()
+
+import random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.kludgy_html_parser import fix_urls, simpleHTMLParser, tokenize_to_segments
+
+
+FRAGMENTS = [ '<b>', '</b>', '<B>', '</B>', '<i>', '</i>', '<u>', '</u>', '<em>', '<pre>', '</pre>',
+              '<br />', '<br>', '<br/>', '</br>', '<html>', '</html>', '<html/>', '<b/>', '</b/>',
+              '<a href="http://x.y/?a=1&amp;b=2">', "<a href='q'>", '<a href="">', '<A HREF="Z">',
+              '<a>', '<a/>', '</a>', '<p class="x">', '</p>', '<x-y>', '<script>', '<!-- c -->',
+              '&amp;', '&amp', '&lt;', '&nbsp;', '&hellip;', '&a-b.c', '&', '&;', '&#169;', '&#x;',
+              '<', '>', '<3', '</ b>', 'a < b', '"', "'", 'x;', 'text', 'é', ' ', '  ', '\n',
+              'http://www.google.com/', '(https://a.b/c).', 'xxxxxxxxxxxxhttp://i.imgur.com/E3gxs.gif)..',
+              '<some@email.com>', '=http://q.com/abcdef', '"http://xyz.com/"' ]
+
+
+def legacy_parse(text):
+    return simpleHTMLParser().feed('<html>' + text + '</html>')
+
+def segment_key(segment):
+    return ( segment.text, segment.type_, segment.is_bold, segment.is_italic,
+             segment.is_strikethrough, segment.is_underline, segment.link_target )
+
+
+random.seed(args.seed)
+
+compared = fallback = 0
+mismatches = []
+for _ in range(args.fuzz):
+    text = fix_urls("".join(random.choice(FRAGMENTS) for _ in range(random.randint(0, 10))))
+    try:
+        expected = [ segment_key(segment) for segment in legacy_parse(text) ]
+    except TypeError:
+        # e.g. </a> without <a>, which the tokenizer must leave to the fallback parser
+        if tokenize_to_segments(text) is not None:
+            mismatches.append(text)
+        continue
+
+    segments = tokenize_to_segments(text)
+    if segments is None:
+        fallback += 1
+        continue
+
+    compared += 1
+    if [ segment_key(segment) for segment in segments ] != expected:
+        mismatches.append(text)
+
+# closing tags without an opening tag are never turned into segments by the tokenizer
+for text in [ '</a>', 'text</a>', '<b>bold</b></a>', '<a href="x">link</a></a>' ]:
+    if tokenize_to_segments(text) is not None:
+        mismatches.append(text)
+
+print("fuzz: {} compared, {} left to the fallback parser, {} mismatches".format(
+    compared, fallback, len(mismatches)))
+for text in mismatches[:10]:
+    print("  {}".format(repr(text)))
+
+
+with open(args.corpus, encoding="utf-8") as file:
+    corpus = [ fix_urls(line.rstrip("\n")) for line in file if line.strip() ]
+messages = [ corpus[index % len(corpus)] for index in range(args.messages) ]
+
+def timed(function):
+    start = time.perf_counter()
+    for text in messages:
+        function(text)
+    return time.perf_counter() - start
+
+def current_parse(text):
+    segments = tokenize_to_segments(text)
+    if segments is None:
+        segments = legacy_parse(text)
+    return segments
+
+legacy = timed(legacy_parse)
+current = timed(current_parse)
+
+print("benchmark: {} messages".format(len(messages)))
+print("simpleHTMLParser:      {:.3f}s".format(legacy))
+print("tokenize_to_segments:  {:.3f}s".format(current))
+print("speedup: {:.2f}x".format(legacy / current))
+
+if mismatches:
+    print("FAILED")
+    sys.exit(1)
+
+print("OK")
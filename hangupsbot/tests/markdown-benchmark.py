@@ -0,0 +1,116 @@
+"""benchmark for parsers.markdown.html_to_hangups_markdown
+
+converts every message of a corpus (one html message per line, default: bridged-messages.txt)
+with both the previous per-call parser (string concatenation, new instance per message)
+and the current one, checks the output is identical and reports the speedup
+
+usage: markdown-benchmark.py [-h] [-r ROUNDS] [corpus]
+
+positional arguments:
+  corpus                file with one html message per line
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -r ROUNDS, --rounds ROUNDS
+                        number of passes over the corpus
+
+example usage (from the hangupsbot directory):
+python3 tests/markdown-benchmark.py -r 500
+"""
+import argparse, os
+
+parser = argparse.ArgumentParser()
+parser.add_argument("corpus", nargs="?", help="file with one html message per line",
+                    default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bridged-messages.txt"))
+parser.add_argument('-r', '--rounds', type=int, default=200, help="number of passes over the corpus")
+
+args = parser.parse_args()
+
+import sys, time
+
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.markdown import html_to_hangups_markdown
+
+
+class legacyHtmlToMarkdownParser(HTMLParser):
+    """previous implementation, kept here as the baseline"""
+
+    def feed(self, html, basic_markdown={}):
+        self._markdown = ""
+        self._basic = basic_markdown
+        self._link_buffer = False
+        super().feed(html)
+        return self._markdown
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for attrname, attrval in attrs:
+                if attrname == "href":
+                    self._link_buffer = "(" + attrval + ")"
+                    break
+        else:
+            self.add_tag(tag, 0)
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._markdown += self._link_buffer
+            self._link_buffer = False
+        else:
+            self.add_tag(tag, 1)
+
+    def handle_data(self, data):
+        if self._link_buffer:
+            self._link_buffer = "[" + data + "]" + self._link_buffer
+        else:
+            self._markdown += data
+
+    def add_tag(self, tag, pos):
+        if tag in self._basic:
+            if isinstance(self._basic[tag], list):
+                self._markdown += self._basic[tag][pos]
+            else:
+                self._markdown += self._basic[tag]
+
+def legacy_html_to_hangups_markdown(html):
+    return legacyHtmlToMarkdownParser().feed(
+        html,
+        {   "b": "**",
+            "em": "_",
+            "i": "_",
+            "pre": "`",
+            "code": "`",
+            "br": ["", "\n"] })
+
+
+with open(args.corpus, encoding="utf-8") as file:
+    corpus = [ line.rstrip("\n") for line in file if line.strip() ]
+
+mismatches = [ html for html in corpus
+               if legacy_html_to_hangups_markdown(html) != html_to_hangups_markdown(html) ]
+
+def timed(function):
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for html in corpus:
+            function(html)
+    return time.perf_counter() - start
+
+legacy = timed(legacy_html_to_hangups_markdown)
+current = timed(html_to_hangups_markdown)
+
+total = len(corpus) * args.rounds
+print("{} messages x {} rounds".format(len(corpus), args.rounds))
+print("legacy:  {:.3f}s ({:.1f} us/message)".format(legacy, legacy / total * 1e6))
+print("current: {:.3f}s ({:.1f} us/message)".format(current, current / total * 1e6))
+print("speedup: {:.2f}x".format(legacy / current))
+
+if mismatches:
+    print("FAILED: {} message(s) converted differently:".format(len(mismatches)))
+    for html in mismatches:
+        print("  {}".format(html))
+    sys.exit(1)
+
+print("OK: output identical for every message")
@@ -3,7 +3,7 @@ import importlib, logging, unicodedata
 
 import hangups_shim as hangups
 
-from parsers import simple_parse_to_segments, segment_to_html
+from parsers import simple_parse_to_segments, segment_to_html, parse_to_serialised_segments
 
 from permamem import name_from_hangups_conversation
 
@@ -109,7 +109,12 @@ class WebFramework:
         message = broadcast_list[0][1]
         image_id = broadcast_list[0][2]
 
-        applicable_configurations = self.applicable_configuration(conv_id)
+        # coro_send_many() may target several conversations at once, relay once per configuration
+        applicable_configurations = []
+        for target_conv_id in [ response[0] for response in broadcast_list ]:
+            for applicable in self.applicable_configuration(target_conv_id):
+                if not any(applicable["config.json"] is seen["config.json"] for seen in applicable_configurations):
+                    applicable_configurations.append(applicable)
         if not applicable_configurations:
             return
 